@@ -0,0 +1,85 @@
+from langgraph.checkpoint.memory import InMemorySaver
+
+
+def _thread_key(config: dict) -> tuple[str, str]:
+    """Extracts the (thread_id, checkpoint_ns) pair a checkpoint belongs to."""
+    configurable = config["configurable"]
+    return configurable["thread_id"], configurable.get("checkpoint_ns", "")
+
+
+class EndOfWorkflowSaver(InMemorySaver):
+    """
+    In-memory checkpointer that persists only the final checkpoint of a run.
+
+    The preprocess -> generate -> postprocess workflow runs atomically, so the
+    intermediate checkpoints LangGraph emits after each node are never read back.
+    Instead of serializing every one of them, the latest `put` (and its writes)
+    is buffered per thread and committed when the thread is next read or when
+    `flush()` is called explicitly.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # (thread_id, checkpoint_ns) -> {"put": put arguments, "writes": [put_writes arguments]}
+        self._pending: dict[tuple[str, str], dict] = {}
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        """
+        Buffers the checkpoint, superseding any uncommitted one for the same thread.
+
+        The base saver stores a channel's value only in the put that bumps its version,
+        so the versions of superseded puts are merged into the buffer. The parent config
+        of the first buffered put is kept, so the committed checkpoint links back to the
+        last checkpoint that was actually saved.
+        """
+        thread_id, checkpoint_ns = _thread_key(config)
+        key = (thread_id, checkpoint_ns)
+        pending = self._pending.get(key)
+        if pending is None:
+            parent_config, versions = config, {}
+        else:
+            parent_config, versions = pending["put"][0], pending["put"][3]
+        self._pending[key] = {
+            "put": (parent_config, checkpoint, metadata, {**versions, **new_versions}),
+            "writes": [],
+        }
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        """Buffers writes that belong to the pending checkpoint; others are stored directly."""
+        pending = self._pending.get(_thread_key(config))
+        if pending is not None and pending["put"][1]["id"] == config["configurable"].get("checkpoint_id"):
+            pending["writes"].append((config, writes, task_id, task_path))
+            return
+        super().put_writes(config, writes, task_id, task_path)
+
+    def flush(self, thread_id: str | None = None) -> None:
+        """Commits the buffered checkpoint of `thread_id`, or of every thread when omitted."""
+        keys = [key for key in self._pending if thread_id is None or key[0] == thread_id]
+        for key in keys:
+            pending = self._pending.pop(key)
+            super().put(*pending["put"])
+            for write_args in pending["writes"]:
+                super().put_writes(*write_args)
+
+    def get_tuple(self, config):
+        self.flush(config["configurable"]["thread_id"])
+        return super().get_tuple(config)
+
+    def list(self, config, **kwargs):
+        if config is None:
+            self.flush()
+        else:
+            self.flush(config["configurable"].get("thread_id"))
+        return super().list(config, **kwargs)
+
+    def delete_thread(self, thread_id: str) -> None:
+        for key in [key for key in self._pending if key[0] == thread_id]:
+            del self._pending[key]
+        super().delete_thread(thread_id)
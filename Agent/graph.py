@@ -1,21 +1,74 @@
-from langchain_xai import ChatXAI
+from __future__ import annotations
+
+import asyncio
+import itertools
+import weakref
+from collections import OrderedDict
+from functools import lru_cache
+from typing import TYPE_CHECKING, Union
 from langgraph.graph import END, START, StateGraph, MessagesState
-from langgraph.checkpoint.memory import InMemorySaver
-from langgraph.types import Command
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
-from typing import Union
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda
 from pydantic import create_model, Field as PydanticField
-from Engine.character import Character
-from Engine.state_manager import GameState
-from Agent.utils import ACTION_REGISTRY, format_system_prompt, generate_system_feedback
+from Agent.checkpoint import EndOfWorkflowSaver
+from Agent.response_cache import ResponseCache
+from Agent.utils import (
+    DYNAMIC_OPTIONS_REGISTRY,
+    compile_prompt_template,
+    format_system_prompt,
+    generate_system_feedback,
+    get_action_definition,
+    memory_signature,
+)
+
+if TYPE_CHECKING:
+    from Engine.character import Character
+    from Engine.state_manager import GameState
+
+__all__ = ["AGENT_CHARACTER_IDS", "NPCAgent", "AgentState", "run_all_npcs"]
+
+# Characters driven by an LLM agent (小张 and 小红); everyone else stays a plain NPC.
+AGENT_CHARACTER_IDS = frozenset({"001", "002"})
 
 # --- Global LLM Configuration ---
-# Define LLM provider
-llm = ChatXAI(model="grok-4-1-fast-non-reasoning", temperature=0.8)
+# Number of structured-output bindings each agent keeps for reuse across turns.
+STRUCTURED_LLM_CACHE_SIZE = 16
+
+# Number of trailing messages compared by similarity when matching turns against the response cache.
+RESPONSE_CACHE_WINDOW = 4
+
+@lru_cache(maxsize=1)
+def _get_llm():
+    """
+    Returns the shared LLM provider, created on first use.
+    Deferring the import keeps the ChatXAI client out of the module import path.
+    """
+    from langchain_xai import ChatXAI
+    return ChatXAI(model="grok-4-1-fast-non-reasoning", temperature=0.8)
+
+# Engine locks shared by all agents operating on the same GameState.
+_ENGINE_LOCKS: weakref.WeakKeyDictionary[GameState, asyncio.Lock] = weakref.WeakKeyDictionary()
+
+# Agents by checkpoint thread. Every agent drives the same compiled graph, whose nodes
+# resolve the agent of the current run from the `thread_id` in their config. Thread ids are
+# never reused, so a collected agent's thread can only miss, never resolve to another agent.
+_AGENTS_BY_THREAD: weakref.WeakValueDictionary[str, NPCAgent] = weakref.WeakValueDictionary()
+
+# Disambiguates threads of agents created for the same character (e.g. after a reset).
+_THREAD_SERIAL = itertools.count(1)
+
+def _engine_lock(game_state: GameState) -> asyncio.Lock:
+    """Returns the asyncio lock guarding engine mutations for `game_state`."""
+    lock = _ENGINE_LOCKS.get(game_state)
+    if lock is None:
+        lock = _ENGINE_LOCKS[game_state] = asyncio.Lock()
+    return lock
 
 class AgentState(MessagesState):
-    """Extends the base MessagesState to include the dynamic system prompt."""
+    """Extends the base MessagesState to include the dynamic system prompt and environment snapshot."""
     system_prompt: str
+    # Nearby characters/items captured once per turn during preprocessing.
+    env_snapshot: dict
 
 class NPCAgent:
     """
@@ -30,132 +83,330 @@ class NPCAgent:
        and handles secondary feedback loops.
     """
     
-    def __init__(self, character: Character, game_state: GameState):
+    def __init__(
+        self,
+        character: Character,
+        game_state: GameState,
+        response_cache_size: int = 0,
+        stringify_decisions: bool = True,
+    ):
         self.character = character
         self.game_state = game_state
         
-        # Initial context synchronization
-        self.game_state.set_active_character(character.name)
         self.system_prompt = character.background
+        self._prompt_template = compile_prompt_template(self.system_prompt)
+        # Last rendered system prompt; reused while memory and location stay the same.
+        self._system_prompt_cache: dict = {}
+        
+        # Whether AI messages carry the full repr of each decision. The history is replayed to the LLM,
+        # so disabling this (content becomes the action name only) trades context for less formatting.
+        self.stringify_decisions = stringify_decisions
+        
+        # Memory persistence across calls, on this agent's own thread of the shared checkpointer.
+        # Only the end-of-turn state is ever read back, so per-node checkpoints are not persisted.
+        self.checkpointer = _shared_checkpointer()
+        self.thread_id = f"{character.id}:{next(_THREAD_SERIAL)}"
+        # Invocation config of this agent's thread. `graph` also accepts the character id as thread_id
+        # (or no config at all); the shared graph itself only accepts this config.
+        self.run_config = {"configurable": {"thread_id": self.thread_id}}
+        _AGENTS_BY_THREAD[self.thread_id] = self
+        # The history is dropped with the agent, so replaced agents do not accumulate in the saver.
+        weakref.finalize(self, self.checkpointer.delete_thread, self.thread_id)
+        
+        # Decision space of the previous turn and what was built for it.
+        self._last_fingerprint: tuple | None = None
+        self._last_schemas: tuple = ()
+        self._last_structured_llm: Runnable | None = None
         
-        # Memory persistence across calls
-        self.checkpointer = InMemorySaver()
+        # Structured-output bindings keyed on the tuple of action schemas offered to the LLM.
+        self._structured_llm_cache: OrderedDict[tuple, Runnable] = OrderedDict()
         
-        # Tracks the last processed event index to ensure system feedback only includes NEW sensory data.
-        self._last_event_index_seen: int = 0
+        # Agents sharing a GameState take turns on engine access when running concurrently.
+        self._engine_lock = _engine_lock(game_state)
         
-        # Compile the state machine
-        self.graph = self._build_graph()
+        # Optional reuse of decisions for near-identical turns (disabled by default).
+        # The action schemas and system prompt are the exact-match part, so a cached reply never
+        # targets a different character; postprocessing still re-validates it against the world.
+        self._response_cache = ResponseCache(max_entries=response_cache_size) if response_cache_size > 0 else None
+        
+        # The state machine is identical for every agent, so it is compiled once and shared;
+        # `graph` binds it to this agent's thread, whatever thread the caller names.
+        self.graph = _AgentGraph(_shared_graph(), self.thread_id, character.id)
     
+    def _check_active_character(self) -> None:
+        """Verifies the shared game_state is focused on this agent's character."""
+        active_name = self.game_state.active_character.name
+        if active_name != self.character.name:
+            raise RuntimeError(
+                f"Context Error: GameState is focused on {active_name}, not {self.character.name}. "
+                "Invoke the agent inside game_state.active_character_scope()."
+            )
+
     def _preprocessing_node(self, state: AgentState) -> dict:
         """
         Gathers environmental data and memory to construct a comprehensive system prompt.
         """
-        # Ensure thread safety by asserting the character context in the shared game_state.
-        self.game_state.set_active_character(self.character.name)
+        # The caller scopes the shared game_state to this character for the whole turn.
+        self._check_active_character()
         
         # Combine static background with dynamic memories and location status.
         memory_data = self.character.load_memory()
         system_prompt = format_system_prompt(
             memory_data=memory_data,
             system_prompt=self.system_prompt,
-            current_location=self.character.current_location
+            current_location=self.character.current_location,
+            template=self._prompt_template,
+            memory_signature=memory_signature(memory_data),
+            cache=self._system_prompt_cache,
         )
         
-        return {"system_prompt": system_prompt}
+        # Capture the surroundings once; the generation node reuses them for sensory feedback.
+        env_snapshot = {
+            "location": self.character.current_location,
+            "nearby": self.game_state.get_characters_options_joined(),
+            "items": "、".join(self.game_state.get_items_in_location()),
+            # Engine versions the snapshot was taken at; generation re-queries if they moved on.
+            "versions": self._engine_versions(),
+        }
+        
+        return {"system_prompt": system_prompt, "env_snapshot": env_snapshot}
 
-    def _generation_node(self, state: AgentState) -> dict:
+    def _prepare_generation(self, state: AgentState) -> tuple[Runnable, list, HumanMessage, tuple]:
         """
-        Resolves valid actions, builds a dynamic schema, and calls the LLM.
+        Resolves valid actions, builds the dynamic schema, and composes the LLM input.
+        This is the engine-facing half of generation; the LLM call itself happens in the node.
         """
-        self.game_state.set_active_character(self.character.name)
+        self._check_active_character()
 
         # 1. Identify which actions are legally possible in the current world state.
-        available_actions = self.game_state.get_action_options()
+        available_actions = tuple(self.game_state.get_action_options())
+        
+        # Steady-state turns (e.g. a run of 说话 exchanges) offer the same actions and options,
+        # so the previous schemas and LLM binding are reused without touching Pydantic.
+        fingerprint = self._action_fingerprint(available_actions)
+        if fingerprint == self._last_fingerprint:
+            return self._compose_generation(state, self._last_structured_llm, self._last_schemas)
         
         # 2. Build dynamic Pydantic models for the LLM's structured output.
         # This handles dynamic options (e.g., list of characters nearby).
+        # Options may be action names or registry indices.
         action_schemas = {}
         for action_name in available_actions:
-            action_def = ACTION_REGISTRY.get(action_name)
-            if action_def:
-                try:
-                    schema = action_def.build_schema(self.game_state)
-                    action_schemas[action_name] = schema
-                except RuntimeError:
-                    # Occurs if an action target list is empty (e.g., no one to talk to).
-                    continue
+            action_def = get_action_definition(action_name)
+            if action_def is None:
+                continue
+            if action_def.static_schema is not None:
+                action_schemas[action_name] = action_def.static_schema
+                continue
+            try:
+                action_schemas[action_name] = action_def.build_schema(self.game_state)
+            except RuntimeError:
+                # Occurs if an action target list is empty (e.g., no one to talk to).
+                continue
         
         if not action_schemas:
             raise ValueError(f"State Error: {self.character.name} has no valid action schemas at this moment.")
         
-        # 3. Construct a Discriminated Union of all possible action schemas.
-        if len(action_schemas) == 1:
-            union_schema = list(action_schemas.values())[0]
-        else:
-            schema_tuple = tuple(action_schemas.values())
-            union_type = Union[schema_tuple]
-            
-            # Wrap the union in a selection model for the LLM.
-            union_schema = create_model(
-                'AgentActionSelection',
-                action=(union_type, PydanticField(description="选择当前环境下最合理的行动"))
-            )
+        # 3-4. Resolve the structured-output LLM for this exact set of schemas.
+        # Schemas are memoized per option set, so their identities form a stable cache key.
+        schemas = tuple(action_schemas.values())
+        structured_llm = self._get_structured_llm(schemas)
         
-        # 4. Configure LLM for structured output targeting our dynamic schema.
-        structured_llm = llm.with_structured_output(union_schema)
+        self._last_fingerprint = fingerprint
+        self._last_schemas = schemas
+        self._last_structured_llm = structured_llm
         
-        # 5. Generate sensory feedback (System Notify) from the engine's event log.
-        full_event_log = getattr(self.game_state.game, "event_log", [])
-        new_events = full_event_log[self._last_event_index_seen :]
-        self._last_event_index_seen = len(full_event_log)
+        return self._compose_generation(state, structured_llm, schemas)
+
+    def _compose_generation(self, state: AgentState, structured_llm: Runnable, schemas: tuple) -> tuple[Runnable, list, HumanMessage, tuple]:
+        """
+        Generates the sensory feedback and composes the message history for the LLM.
+        """
+        # 5. Generate sensory feedback (System Notify) from the dialogue addressed to this agent.
+        # The engine routes it into a per-character mailbox, so the log itself is never scanned.
+        new_events = self.game_state.game.drain_incoming(self.character.name)
 
-        system_feedback = generate_system_feedback(self.game_state, event_log=new_events)
+        # Other agents may have moved or relocated items since preprocessing; a stale snapshot
+        # would contradict the options just built, so the feedback then reads the engine directly.
+        env_snapshot = state.get('env_snapshot')
+        if env_snapshot is not None and env_snapshot.get("versions") != self._engine_versions():
+            env_snapshot = None
+
+        system_feedback = generate_system_feedback(
+            self.game_state,
+            event_log=new_events,
+            env_snapshot=env_snapshot,
+        )
         
-        # 6. Compose the message history and invoke the LLM.
+        # 6. Compose the message history for the LLM.
         system_prompt = state.get('system_prompt', '')
         feedback_message = HumanMessage(content=system_feedback)
         
         messages = [SystemMessage(content=system_prompt)] + list(state.get('messages', [])) + [feedback_message]
         
-        structured_output = structured_llm.invoke(messages)
+        return structured_llm, messages, feedback_message, schemas
+
+    def _engine_versions(self) -> tuple[int, int]:
+        """The engine's roster and item versions; they change whenever the surroundings may have."""
+        game = self.game_state.game
+        return game.roster_version, game.items_version
+
+    def _action_fingerprint(self, available_actions: tuple) -> tuple:
+        """
+        Identifies the current decision space: the offered actions plus the resolved
+        options of every dynamic field they depend on.
+        """
+        resolver_names = []
+        for action_name in available_actions:
+            action_def = get_action_definition(action_name)
+            if action_def is None:
+                continue
+            for field_def in action_def.fields.values():
+                resolver_name = field_def.get("options_from")
+                if field_def.get("type") == "dynamic" and resolver_name not in resolver_names:
+                    resolver_names.append(resolver_name)
         
+        resolved = tuple(
+            (name, tuple(DYNAMIC_OPTIONS_REGISTRY[name](self.game_state)))
+            for name in resolver_names
+        )
+        return available_actions, resolved
+
+    def _finish_generation(self, structured_output, feedback_message: HumanMessage) -> dict:
+        """
+        Wraps the LLM's structured choice into the messages appended to the history.
+        """
         # Unwrap the selection model if necessary.
         if hasattr(structured_output, 'action'):
             structured_output = structured_output.action
         
         # Encapsulate the structured choice in an AIMessage for history tracking.
+        if self.stringify_decisions:
+            content = str(structured_output)
+        else:
+            content = getattr(structured_output, "行动类型", "")
         ai_message = AIMessage(
-            content=str(structured_output), 
+            content=content, 
             additional_kwargs={"structured_output": structured_output}
         )
         
         return {"messages": [feedback_message, ai_message]}
 
+    def _generation_node(self, state: AgentState) -> dict:
+        """
+        Resolves valid actions, builds a dynamic schema, and calls the LLM.
+        """
+        structured_llm, messages, feedback_message, schemas = self._prepare_generation(state)
+        structured_output = self._lookup_response(schemas, messages)
+        if structured_output is None:
+            structured_output = structured_llm.invoke(messages)
+            self._store_response(schemas, messages, structured_output)
+        return self._finish_generation(structured_output, feedback_message)
+
+    async def _agenerate_node(self, state: AgentState) -> dict:
+        """
+        Async variant of the generation node.
+        Only engine access is serialized; the LLM call runs lock-free so concurrent NPCs overlap.
+        """
+        async with self._engine_lock:
+            structured_llm, messages, feedback_message, schemas = self._prepare_generation(state)
+        structured_output = self._lookup_response(schemas, messages)
+        if structured_output is None:
+            structured_output = await structured_llm.ainvoke(messages)
+            self._store_response(schemas, messages, structured_output)
+        return self._finish_generation(structured_output, feedback_message)
+
+    def _response_cache_key(self, schemas: tuple, messages: list) -> tuple:
+        """
+        Splits a turn into the cache's exact key and fuzzy text.
+        The system prompt (background, memories, location) must match verbatim along with the schemas;
+        only the volatile tail of the conversation is compared by similarity.
+        """
+        exact_key = (schemas, messages[0].content)
+        text = "\n".join(str(message.content) for message in messages[1:][-RESPONSE_CACHE_WINDOW:])
+        return exact_key, text
+
+    def _lookup_response(self, schemas: tuple, messages: list):
+        """Returns a cached decision for a near-identical turn, or None when caching is off or missed."""
+        if self._response_cache is None:
+            return None
+        return self._response_cache.lookup(*self._response_cache_key(schemas, messages))
+
+    def _store_response(self, schemas: tuple, messages: list, structured_output) -> None:
+        if self._response_cache is not None:
+            self._response_cache.store(*self._response_cache_key(schemas, messages), structured_output)
+
+    def _get_structured_llm(self, schemas: tuple):
+        """
+        Returns an LLM bound to the discriminated union of `schemas`.
+        Bindings are kept in a small LRU so steady-state turns skip schema derivation.
+        """
+        structured_llm = self._structured_llm_cache.get(schemas)
+        if structured_llm is not None:
+            self._structured_llm_cache.move_to_end(schemas)
+            return structured_llm
+        
+        # Construct a Discriminated Union of all possible action schemas.
+        if len(schemas) == 1:
+            union_schema = schemas[0]
+        else:
+            union_type = Union[schemas]
+            
+            # Wrap the union in a selection model for the LLM.
+            union_schema = create_model(
+                'AgentActionSelection',
+                action=(union_type, PydanticField(description="选择当前环境下最合理的行动"))
+            )
+        
+        # Configure LLM for structured output targeting our dynamic schema.
+        structured_llm = _get_llm().with_structured_output(union_schema)
+        
+        self._structured_llm_cache[schemas] = structured_llm
+        if len(self._structured_llm_cache) > STRUCTURED_LLM_CACHE_SIZE:
+            self._structured_llm_cache.popitem(last=False)
+        return structured_llm
+
     def _postprocessing_node(self, state: AgentState) -> dict:
         """
         Translates the LLM's structured intention into engine commands.
         """
-        self.game_state.set_active_character(self.character.name)
+        self._check_active_character()
 
         messages = state.get('messages', [])
         
         # Retrieve the latest decision from the AI.
-        last_ai_message = None
-        for message in reversed(messages):
-            if isinstance(message, AIMessage):
-                last_ai_message = message
-                break
+        # The generation node always appends it last; scan backwards only if that invariant breaks.
+        if messages and isinstance(messages[-1], AIMessage):
+            last_ai_message = messages[-1]
+        else:
+            last_ai_message = None
+            for message in reversed(messages):
+                if isinstance(message, AIMessage):
+                    last_ai_message = message
+                    break
         
         if last_ai_message is None or 'structured_output' not in last_ai_message.additional_kwargs:
             raise ValueError("Logic Error: Missing structured AI output in state history.")
         
         structured_output = last_ai_message.additional_kwargs['structured_output']
         
-        # Format the Pydantic model back into a raw dictionary for the GameState.
-        action_data = structured_output.model_dump() if hasattr(structured_output, 'model_dump') else structured_output
-        action_name = action_data.get("行动类型")
-        args = {k: v for k, v in action_data.items() if k != "行动类型"}
+        # Read the Pydantic fields directly for the GameState; model_dump's serializer pass is not needed.
+        if hasattr(structured_output, 'model_dump'):
+            action_name = getattr(structured_output, "行动类型")
+            args = {
+                field: getattr(structured_output, field)
+                for field in type(structured_output).model_fields
+                if field != "行动类型"
+            }
+        else:
+            action_name = structured_output.get("行动类型")
+            args = {k: v for k, v in structured_output.items() if k != "行动类型"}
+        
+        # Concurrent agents may have changed the world while this one was deciding,
+        # so a choice made against options that no longer hold is reported back instead of applied.
+        stale_reason = self._stale_choice_reason(action_name, args)
+        if stale_reason is not None:
+            return {"messages": [HumanMessage(content=f"系统反馈：{stale_reason}")]}
         
         formatted_output = {"action": action_name, "args": args}
         
@@ -169,22 +420,34 @@ class NPCAgent:
         outcome_message = HumanMessage(content=f"系统反馈：{feedback}")
         return {"messages": [outcome_message]}
 
-    def _build_graph(self):
+    def _stale_choice_reason(self, action_name: str, args: dict) -> str | None:
         """
-        Constructs the cyclic state machine for the agent workflow.
+        Re-checks a decision against the current action options; returns why it no longer applies, or None.
+        The options offered at generation time can be outdated by the time postprocessing runs.
         """
-        builder = StateGraph(AgentState)
-        
-        builder.add_node("preprocess", self._preprocessing_node)
-        builder.add_node("generate", self._generation_node)
-        builder.add_node("postprocess", self._postprocessing_node)
-        
-        builder.add_edge(START, "preprocess")
-        builder.add_edge("preprocess", "generate")
-        builder.add_edge("generate", "postprocess")
-        builder.add_edge("postprocess", END)
+        if action_name not in self.game_state.get_action_options_set():
+            return f"情况发生了变化，‘{action_name}’现在无法执行。"
         
-        return builder.compile(checkpointer=self.checkpointer)
+        action_def = get_action_definition(action_name)
+        if action_def is None:
+            return None
+        for field_name, field_def in action_def.fields.items():
+            if field_def.get("type") != "dynamic" or field_name not in args:
+                continue
+            options = DYNAMIC_OPTIONS_REGISTRY[field_def.get("options_from")](self.game_state)
+            if args[field_name] not in options:
+                return f"情况发生了变化，{field_name}‘{args[field_name]}’已不可选，‘{action_name}’未能执行。"
+        return None
+
+    async def _apreprocessing_node(self, state: AgentState) -> dict:
+        """Async variant of the preprocessing node, serialized against other agents."""
+        async with self._engine_lock:
+            return self._preprocessing_node(state)
+
+    async def _apostprocessing_node(self, state: AgentState) -> dict:
+        """Async variant of the postprocessing node, serialized against other agents."""
+        async with self._engine_lock:
+            return self._postprocessing_node(state)
 
     def draw_graph(self) -> str:
         """
@@ -194,3 +457,136 @@ class NPCAgent:
             return self.graph.get_graph().draw_mermaid()
         except Exception as e:
             return f"Mermaid Generation Error: {str(e)}"
+
+
+class _AgentGraph:
+    """
+    The shared compiled graph, bound to one agent's checkpoint thread.
+    Config-taking calls are pinned to that thread; everything else is forwarded unchanged.
+    """
+    
+    __slots__ = ("_graph", "_thread_id", "_character_id")
+    
+    def __init__(self, graph, thread_id: str, character_id: str):
+        self._graph = graph
+        self._thread_id = thread_id
+        self._character_id = character_id
+    
+    def _bind(self, config: RunnableConfig | None) -> RunnableConfig:
+        """Returns `config` with its thread set to the agent's own; foreign threads are rejected."""
+        config = dict(config or {})
+        configurable = dict(config.get("configurable") or {})
+        thread_id = configurable.get("thread_id")
+        if thread_id not in (None, self._thread_id, self._character_id):
+            raise ValueError(
+                f"Config Error: thread '{thread_id}' does not belong to this agent "
+                f"(use agent.run_config or thread_id='{self._character_id}')."
+            )
+        configurable["thread_id"] = self._thread_id
+        config["configurable"] = configurable
+        return config
+    
+    def invoke(self, input, config: RunnableConfig | None = None, **kwargs):
+        return self._graph.invoke(input, self._bind(config), **kwargs)
+    
+    async def ainvoke(self, input, config: RunnableConfig | None = None, **kwargs):
+        return await self._graph.ainvoke(input, self._bind(config), **kwargs)
+    
+    def stream(self, input, config: RunnableConfig | None = None, **kwargs):
+        return self._graph.stream(input, self._bind(config), **kwargs)
+    
+    def astream(self, input, config: RunnableConfig | None = None, **kwargs):
+        return self._graph.astream(input, self._bind(config), **kwargs)
+    
+    def get_state(self, config: RunnableConfig | None = None, **kwargs):
+        return self._graph.get_state(self._bind(config), **kwargs)
+    
+    async def aget_state(self, config: RunnableConfig | None = None, **kwargs):
+        return await self._graph.aget_state(self._bind(config), **kwargs)
+    
+    def get_state_history(self, config: RunnableConfig | None = None, **kwargs):
+        return self._graph.get_state_history(self._bind(config), **kwargs)
+    
+    def aget_state_history(self, config: RunnableConfig | None = None, **kwargs):
+        return self._graph.aget_state_history(self._bind(config), **kwargs)
+    
+    def update_state(self, config: RunnableConfig | None, values, **kwargs):
+        return self._graph.update_state(self._bind(config), values, **kwargs)
+    
+    async def aupdate_state(self, config: RunnableConfig | None, values, **kwargs):
+        return await self._graph.aupdate_state(self._bind(config), values, **kwargs)
+    
+    def __getattr__(self, name: str):
+        return getattr(self._graph, name)
+
+
+def _agent_for(config: RunnableConfig) -> NPCAgent:
+    """Resolves the agent whose thread the shared graph is running."""
+    thread_id = config["configurable"]["thread_id"]
+    agent = _AGENTS_BY_THREAD.get(thread_id)
+    if agent is None:
+        raise RuntimeError(
+            f"Context Error: No live NPCAgent owns thread '{thread_id}'. "
+            "Invoke it through agent.graph, or pass agent.run_config."
+        )
+    return agent
+
+
+# Node entry points of the shared graph; each forwards to the owning agent's node method.
+def _preprocess(state: AgentState, config: RunnableConfig) -> dict:
+    return _agent_for(config)._preprocessing_node(state)
+
+async def _apreprocess(state: AgentState, config: RunnableConfig) -> dict:
+    return await _agent_for(config)._apreprocessing_node(state)
+
+def _generate(state: AgentState, config: RunnableConfig) -> dict:
+    return _agent_for(config)._generation_node(state)
+
+async def _agenerate(state: AgentState, config: RunnableConfig) -> dict:
+    return await _agent_for(config)._agenerate_node(state)
+
+def _postprocess(state: AgentState, config: RunnableConfig) -> dict:
+    return _agent_for(config)._postprocessing_node(state)
+
+async def _apostprocess(state: AgentState, config: RunnableConfig) -> dict:
+    return await _agent_for(config)._apostprocessing_node(state)
+
+
+@lru_cache(maxsize=1)
+def _shared_checkpointer() -> EndOfWorkflowSaver:
+    """Returns the checkpointer shared by all agents; their histories are isolated by thread."""
+    return EndOfWorkflowSaver()
+
+
+@lru_cache(maxsize=1)
+def _shared_graph():
+    """
+    Constructs the cyclic state machine for the agent workflow, once for all agents.
+    Nodes dispatch to the agent that owns the thread being run.
+    """
+    builder = StateGraph(AgentState)
+    
+    # Each node supports both `invoke` and `ainvoke`.
+    builder.add_node("preprocess", RunnableLambda(_preprocess, afunc=_apreprocess))
+    builder.add_node("generate", RunnableLambda(_generate, afunc=_agenerate))
+    builder.add_node("postprocess", RunnableLambda(_postprocess, afunc=_apostprocess))
+    
+    builder.add_edge(START, "preprocess")
+    builder.add_edge("preprocess", "generate")
+    builder.add_edge("generate", "postprocess")
+    builder.add_edge("postprocess", END)
+    
+    return builder.compile(checkpointer=_shared_checkpointer())
+
+
+async def run_all_npcs(agents: list[NPCAgent]) -> list[dict]:
+    """
+    Runs one workflow turn for every agent concurrently.
+    The LLM calls overlap, so the turn takes roughly as long as the slowest single call.
+    """
+    async def _run(agent: NPCAgent) -> dict:
+        # Each gathered coroutine runs in its own task context, so the scopes do not collide.
+        with agent.game_state.active_character_scope(agent.character.name):
+            return await agent.graph.ainvoke({}, agent.run_config)
+
+    return await asyncio.gather(*(_run(agent) for agent in agents))
@@ -0,0 +1,78 @@
+import hashlib
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+# Per-bit byte tables: _BIT_TABLES[bit] maps a byte to 1 if that bit is set, else 0.
+_BIT_TABLES = tuple(bytes((value >> bit) & 1 for value in range(256)) for bit in range(8))
+
+
+def simhash(text: str, ngram: int = 3) -> int:
+    """
+    Computes a 64-bit SimHash over character n-grams.
+    Character n-grams suit the Chinese prompts here, which have no whitespace tokens.
+    """
+    if len(text) < ngram:
+        grams = [text]
+    else:
+        grams = [text[i:i + ngram] for i in range(len(text) - ngram + 1)]
+
+    # Bits are tallied column-wise over all digests at once instead of per gram and bit:
+    # byte k of every digest is sliced out together, and each bit of it is counted in one C-level pass.
+    digests = b"".join(hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest() for gram in grams)
+    half = len(grams) / 2
+    fingerprint = 0
+    for byte_index in range(8):
+        column = digests[byte_index::8]
+        # Digest bytes are big-endian, so byte 0 holds the most significant bits.
+        shift = (7 - byte_index) * 8
+        for bit, table in enumerate(_BIT_TABLES):
+            if column.translate(table).count(1) > half:
+                fingerprint |= 1 << (shift + bit)
+    return fingerprint
+
+
+class ResponseCache:
+    """
+    Reuses LLM decisions for structurally similar agent turns (GenCache-style).
+
+    Each entry is keyed on an exact part and a fuzzy part:
+    - The exact key must match verbatim. Callers put critical differences in it,
+      such as the action schemas whose Literal options encode targets, items and directions.
+    - The fuzzy key is a SimHash of the prompt text. It matches within `max_distance` bits.
+    """
+
+    def __init__(self, max_entries: int = 256, max_distance: int = 3):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        # All entries in least-recently-used order, for eviction.
+        self._entries: OrderedDict[tuple[Hashable, int], Any] = OrderedDict()
+        # Fingerprints per exact key, so a lookup only scans the entries it could match.
+        self._fingerprints: dict[Hashable, set[int]] = {}
+
+    def lookup(self, exact_key: Hashable, text: str) -> Any | None:
+        """Returns a cached response for a similar prompt under `exact_key`, or None."""
+        fingerprints = self._fingerprints.get(exact_key)
+        if not fingerprints:
+            return None
+        query = simhash(text)
+        fingerprint = min(fingerprints, key=lambda cached: (cached ^ query).bit_count())
+        if (fingerprint ^ query).bit_count() > self.max_distance:
+            return None
+        key = (exact_key, fingerprint)
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def store(self, exact_key: Hashable, text: str, response: Any) -> None:
+        """Records `response` for the prompt, evicting the least recently used entry when full."""
+        fingerprint = simhash(text)
+        key = (exact_key, fingerprint)
+        self._entries[key] = response
+        self._entries.move_to_end(key)
+        self._fingerprints.setdefault(exact_key, set()).add(fingerprint)
+        if len(self._entries) > self.max_entries:
+            (evicted_exact, evicted_fingerprint), _ = self._entries.popitem(last=False)
+            bucket = self._fingerprints[evicted_exact]
+            bucket.discard(evicted_fingerprint)
+            if not bucket:
+                del self._fingerprints[evicted_exact]
@@ -1,7 +1,11 @@
 import re
-from pydantic import create_model, Field
+from functools import lru_cache
+from string import Template
+from types import MappingProxyType
+from pydantic import BaseModel, create_model, Field
+from Engine.core import MAILBOX_ACTIONS
 from Engine.state_manager import GameState
-from typing import Any, Callable, Literal
+from typing import Any, Callable, Iterable, Literal
 
 
 class ActionDefinition:
@@ -9,50 +13,107 @@ class ActionDefinition:
     Defines the structure of an NPC action and provides logic to generate 
     a dynamic Pydantic schema for LLM validation.
     """
+    __slots__ = ("name", "fields", "_discriminator_field", "_static_fields", "_dynamic_fields", "static_schema")
+
     def __init__(self, name: str, fields: dict):
         self.name = name
-        self.fields = fields
+        # Frozen, since the precomputed field splits and cached schemas below assume the definition never changes.
+        self.fields = MappingProxyType({
+            field_name: MappingProxyType(dict(field_def)) for field_name, field_def in fields.items()
+        })
+        
+        # The discriminator `Literal[name]` is constant per action, so it is built once.
+        self._discriminator_field = (_literal_type(name), Field(description="行动的唯一标识符"))
+        
+        # Split the fields once: static fields map straight to pydantic field definitions,
+        # dynamic ones keep only what is needed to resolve their options per turn.
+        self._static_fields: dict[str, tuple[Any, Any]] = {}
+        self._dynamic_fields: tuple[tuple[str, str | None], ...] = ()
+        for field_name, field_def in fields.items():
+            if field_def.get("type") == "dynamic":
+                self._dynamic_fields += ((field_name, field_def.get("options_from")),)
+            else:
+                # Standard field (e.g., free text '内心' or '内容').
+                field_type = field_def.get("type", str)
+                self._static_fields[field_name] = (field_type, Field(description=field_def.get("description", "")))
+        
+        # Populated after registry construction for actions without dynamic fields.
+        self.static_schema: type[BaseModel] | None = None
     
-    def build_schema(self, game_state: GameState):
+    def is_static(self) -> bool:
+        """True when no field depends on the engine, so the schema never changes."""
+        return not self._dynamic_fields
+    
+    def build_schema(self, game_state: GameState | None):
         """
         Constructs a Pydantic model at runtime. 
         Dynamic fields (like interaction targets) are resolved using the current GameState.
+        Models are memoized per distinct set of resolved options.
+        Static actions may pass `None` since no resolver is consulted.
         """
+        if self.static_schema is not None:
+            return self.static_schema
+
+        # 1. Resolve the valid choices of every dynamic field from the engine.
+        dynamic_resolved: dict[str, tuple[str, ...]] = {}
+        for field_name, resolver_name in self._dynamic_fields:
+            resolver_fn = DYNAMIC_OPTIONS_REGISTRY.get(resolver_name)
+            
+            if resolver_fn is None:
+                raise KeyError(f"Registry Error: Resolver '{resolver_name}' is not registered.")
+
+            options = resolver_fn(game_state)
+            if not options:
+                raise RuntimeError(f"Context Error: Resolver '{resolver_name}' returned no valid options.")
+            dynamic_resolved[field_name] = tuple(options)
+
+        return _compile_schema(self, tuple(dynamic_resolved.items()))
+
+    def _create_schema(self, dynamic_resolved: dict[str, tuple[str, ...]]) -> type[BaseModel]:
+        """Creates the Pydantic model with dynamic fields constrained to `dynamic_resolved`."""
         pydantic_fields: dict[str, Any] = {}
         
-        # 1. Add the discriminator field to identify the action type.
-        pydantic_fields["行动类型"] = (Literal.__getitem__(self.name), Field(description="行动的唯一标识符"))
+        # 2. Add the discriminator field to identify the action type.
+        pydantic_fields["行动类型"] = self._discriminator_field
         
-        # 2. Iterate through fields and resolve types/options.
+        # 3. Lay out the fields in declaration order, constraining dynamic ones to the resolved options.
         for field_name, field_def in self.fields.items():
-            description = field_def.get("description", "")
-            
-            if field_def.get("type") == "dynamic":
-                # Resolve the list of valid choices from the engine.
-                resolver_name = field_def.get("options_from")
-                resolver_fn = DYNAMIC_OPTIONS_REGISTRY.get(resolver_name)
-                
-                if resolver_fn is None:
-                    raise KeyError(f"Registry Error: Resolver '{resolver_name}' is not registered.")
-
-                options = resolver_fn(game_state)
-                if not options:
-                    raise RuntimeError(f"Context Error: Resolver '{resolver_name}' returned no valid options.")
-
+            if field_name in dynamic_resolved:
                 # Create a Literal type to constrain the LLM to specific engine-provided strings.
-                if len(options) == 1:
-                    literal_type = Literal.__getitem__(options[0])
-                else:
-                    literal_type = Literal.__getitem__(tuple(options))
-                pydantic_fields[field_name] = (literal_type, Field(description=description))
+                literal_type = _literal_type(dynamic_resolved[field_name])
+                pydantic_fields[field_name] = (literal_type, Field(description=field_def.get("description", "")))
             else:
-                # Standard field (e.g., free text '内心' or '内容').
-                field_type = field_def.get("type", str)
-                pydantic_fields[field_name] = (field_type, Field(description=description))
+                pydantic_fields[field_name] = self._static_fields[field_name]
 
         return create_model(f"{self.name}Action", **pydantic_fields)
 
 
+# Bounds of the schema and Literal caches below. Their keys include dynamic option sets
+# (rosters, item sets), so a long simulation would otherwise grow them without limit.
+SCHEMA_CACHE_SIZE = 256
+LITERAL_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=SCHEMA_CACHE_SIZE)
+def _compile_schema(action_def: ActionDefinition, dynamic_options: tuple[tuple[str, tuple[str, ...]], ...]) -> type[BaseModel]:
+    """
+    Returns the model of `action_def` for one set of resolved dynamic options.
+    Scenes with the same cast/items/directions reuse the model instead of rebuilding it.
+    """
+    return action_def._create_schema(dict(dynamic_options))
+
+
+@lru_cache(maxsize=LITERAL_CACHE_SIZE)
+def _literal_type(options: str | tuple[str, ...]) -> Any:
+    """
+    Returns a cached `Literal[...]` over a single value or a tuple of values.
+    `Literal.__getitem__` allocates a new alias per call; repeat scenes (same cast in a room) hit the cache.
+    """
+    if isinstance(options, tuple) and len(options) == 1:
+        return Literal.__getitem__(options[0])
+    return Literal.__getitem__(options)
+
+
 # Registry for functions that provide dynamic values for Pydantic Literals.
 DYNAMIC_OPTIONS_REGISTRY: dict[str, Callable[[GameState], list[str]]] = {
     "get_characters": GameState.get_characters_options,
@@ -141,84 +202,204 @@ ACTION_REGISTRY: dict[str, ActionDefinition] = {
     ),
 }
 
+# Positional views of the registry for callers that identify actions by integer id.
+ACTION_REGISTRY_TUPLE: tuple[tuple[str, ActionDefinition], ...] = tuple(ACTION_REGISTRY.items())
+ACTION_NAME_TO_IDX: dict[str, int] = {name: i for i, name in enumerate(ACTION_REGISTRY)}
+
+
+def get_action_definition(action: str | int) -> ActionDefinition | None:
+    """Resolves an action by name, or by its index in `ACTION_REGISTRY_TUPLE`."""
+    if isinstance(action, int):
+        if 0 <= action < len(ACTION_REGISTRY_TUPLE):
+            return ACTION_REGISTRY_TUPLE[action][1]
+        return None
+    return ACTION_REGISTRY.get(action)
+
+
+# Static actions never depend on the world state, so their models are built once at import.
+for _action_def in ACTION_REGISTRY.values():
+    if _action_def.is_static():
+        _action_def.static_schema = _action_def.build_schema(None)
+del _action_def
+
 # --- Context Engineering ---
 
-def format_system_prompt(memory_data: list[dict], system_prompt: str = "", current_location: str | None = None) -> str:
+# Matches the memory block of a character background; compiled once since it runs every turn.
+_MEMORY_RE = re.compile(r"<memory>(.*?)</memory>", re.DOTALL)
+
+
+class PromptTemplate:
+    """
+    A character background precompiled into a `string.Template`.
+    The single <memory> block becomes `${memory_block}` and the spatial status is appended as
+    `${location_block}`, so per-turn formatting is one substitution instead of a regex pass.
+    """
+    def __init__(self, system_prompt: str):
+        match = _MEMORY_RE.search(system_prompt)
+        if match is None:
+            raise ValueError("Template Error: Prompt has no <memory> block.")
+        
+        prefix = system_prompt[:match.start()].replace("$", "$$")
+        suffix = system_prompt[match.end():].replace("$", "$$")
+        self.template = Template(f"{prefix}${{memory_block}}{suffix}${{location_block}}")
+        
+        # The original block is kept verbatim for turns without new memories.
+        self.original_block = match.group(0)
+        self.existing_memory = match.group(1).strip()
+
+    def render(self, formatted_memories: str | None, status_info: str) -> str:
+        if formatted_memories is None:
+            memory_block = self.original_block
+        elif self.existing_memory:
+            memory_block = f"<memory>\n{self.existing_memory}\n{formatted_memories}\n</memory>"
+        else:
+            memory_block = f"<memory>\n{formatted_memories}\n</memory>"
+        return self.template.safe_substitute(memory_block=memory_block, location_block=status_info)
+
+
+def compile_prompt_template(system_prompt: str) -> PromptTemplate | None:
+    """
+    Precompiles a background for `format_system_prompt`.
+    Returns None when the prompt has no single <memory> block, in which case the regex path is used.
+    """
+    if not system_prompt or len(_MEMORY_RE.findall(system_prompt)) != 1:
+        return None
+    return PromptTemplate(system_prompt)
+
+
+def memory_signature(memory_data: list[dict]) -> int:
+    """Hashes the rendered parts of the memory entries; equal signatures produce the same prompt."""
+    return hash(tuple((entry.get("time"), entry.get("content")) for entry in memory_data))
+
+
+def format_system_prompt(
+    memory_data: list[dict],
+    system_prompt: str = "",
+    current_location: str | None = None,
+    template: PromptTemplate | None = None,
+    memory_signature: int | None = None,
+    cache: dict | None = None,
+) -> str:
     """
     Enriches the character's base personality with dynamic world context.
     - Injects specific memories into marked <memory> tags.
     - Appends current spatial status.
+    A `template` compiled from the same `system_prompt` skips re-scanning the prompt.
+    With a caller-owned `cache` dict and the `memory_signature` of `memory_data`,
+    the previous result is returned as-is while memory and location are unchanged.
     """
     if not system_prompt:
         return ""
     
-    # 1. Memory Injection
+    if cache is None or memory_signature is None:
+        return _render_system_prompt(memory_data, system_prompt, current_location, template)
+    
+    cache_key = (memory_signature, system_prompt, current_location)
+    if cache.get("key") != cache_key:
+        cache["prompt"] = _render_system_prompt(memory_data, system_prompt, current_location, template)
+        cache["key"] = cache_key
+    return cache["prompt"]
+
+
+def _render_system_prompt(
+    memory_data: list[dict],
+    system_prompt: str,
+    current_location: str | None,
+    template: PromptTemplate | None,
+) -> str:
+    """Builds the prompt for `format_system_prompt`."""
+    formatted_memories = None
     if memory_data:
-        memory_lines = []
-        for entry in memory_data:
-            time = entry.get("time", "某个时刻")
-            content = entry.get("content", "")
-            if content:
-                memory_lines.append(f"【{time}】{content}")
-        
-        formatted_memories = "\n".join(memory_lines)
-        
-        # Replace or insert into the <memory> block if it exists in the prompt template.
-        if "<memory>" in system_prompt:
-            match = re.search(r"<memory>(.*?)</memory>", system_prompt, flags=re.DOTALL)
-            if match:
-                existing = match.group(1).strip()
-                combined = f"{existing}\n{formatted_memories}" if existing else formatted_memories
-            else:
-                combined = formatted_memories
-            
-            replacement = f"<memory>\n{combined}\n</memory>"
-            system_prompt = re.sub(r"<memory>.*?</memory>", replacement, system_prompt, flags=re.DOTALL)
+        formatted_memories = "\n".join(
+            f"【{entry.get('time', '某个时刻')}】{entry['content']}"
+            for entry in memory_data
+            if entry.get("content")
+        )
+    
+    if template is not None:
+        status_info = f"\n\n--- 空间定位 ---\n你目前所在地点：{current_location}\n" if current_location else ""
+        return template.render(formatted_memories, status_info)
+    
+    # 1. Memory Injection
+    # The tags are literal, so partitioning finds prefix/body/suffix in a single pass.
+    if formatted_memories is not None:
+        prefix, open_tag, rest = system_prompt.partition("<memory>")
+        if open_tag:
+            body, close_tag, suffix = rest.partition("</memory>")
+            if close_tag:
+                existing_memory = body.strip()
+                system_prompt = "".join((
+                    prefix,
+                    "<memory>\n",
+                    f"{existing_memory}\n" if existing_memory else "",
+                    formatted_memories,
+                    "\n</memory>",
+                    suffix,
+                ))
     
     # 2. Spatial Status Append
+    # Fragments are joined once so a multi-KB background is copied a single time.
+    parts = [system_prompt]
     if current_location:
-        status_info = f"\n\n--- 空间定位 ---\n你目前所在地点：{current_location}\n"
-        system_prompt += status_info
+        parts.append(f"\n\n--- 空间定位 ---\n你目前所在地点：{current_location}\n")
     
-    return system_prompt
+    return "".join(parts)
 
 
-def generate_system_feedback(game_state: GameState, event_log: list[dict] | None = None) -> str:
+def generate_system_feedback(
+    game_state: GameState,
+    event_log: Iterable[dict] | None = None,
+    env_snapshot: dict | None = None,
+) -> str:
     """
     Constructs a 'Sensory Input' report for the agent based on the world state.
     Provides the LLM with information about their surroundings and any direct interactions.
+    `event_log` may be any iterable of events (e.g. a character's drained mailbox).
+    `env_snapshot` ({"location", "nearby", "items"} with names pre-joined by "、")
+    skips re-querying the engine when provided.
     """
     actor = game_state.active_character
     
     # Segment 1: Environmental Sensing
-    nearby = game_state.get_characters_options()
-    nearby_str = "、".join(nearby) if nearby else "None"
+    if env_snapshot is not None:
+        location = env_snapshot["location"]
+        nearby_str = env_snapshot["nearby"]
+        items_str = env_snapshot["items"]
+    else:
+        location = actor.current_location
+        nearby_str = game_state.get_characters_options_joined()
+        items_str = "、".join(game_state.get_items_in_location())
     
-    items = game_state.get_items_in_location()
-    items_str = "、".join(items) if items else "None"
+    nearby_str = nearby_str or "None"
+    items_str = items_str or "None"
     
     feedback = [
         "### 环境感知",
-        f"- **当前位置**: {actor.current_location}",
+        f"- **当前位置**: {location}",
         f"- **附近人物**: {nearby_str}",
         f"- **周围物品**: {items_str}"
     ]
     
     # Segment 2: Dialogue Sensing (Parsing direct mentions in the event log)
+    # A single pass filters and renders the events addressed to this actor.
     incoming = []
-    if event_log:
+    if event_log is not None:
+        actor_name = actor.name
         for event in event_log:
-            action = event.get("action", "")
-            actor_name = event.get("actor")
-            args = event.get("args", {}) or {}
+            action = event.get("action")
+            if action not in MAILBOX_ACTIONS:
+                continue
+
+            args = event.get("args") or {}
             target = args.get("目标") or event.get("target_override")
+            if target != actor_name:
+                continue
             
-            if action in ["说话", "开始说话", "继续说话"] and target == actor.name:
+            if action == "结束说话":
+                incoming.append(f"> **系统提示**: {event.get('actor')} 结束了与你的对话。")
+            else:
                 content = args.get("内容", "（对你发起了对话）")
-                incoming.append(f"> **{actor_name}** 对你说: {content}")
-            
-            elif action == "结束说话" and target == actor.name:
-                incoming.append(f"> **系统提示**: {actor_name} 结束了与你的对话。")
+                incoming.append(f"> **{event.get('actor')}** 对你说: {content}")
     
     if incoming:
         feedback.append("\n### 实时通信")
@@ -1,5 +1,70 @@
-import json
 import os
+from functools import lru_cache
+from Engine.json_loader import JSONDecodeError, load_json
+
+
+def _mtime_ns(path: str) -> int | None:
+    """Returns the file's modification time in nanoseconds, or None if it does not exist."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+# The parsers below are cached on (path, mtime), so an edited file is re-read on its next use
+# while an unchanged one is parsed only once.
+
+@lru_cache(maxsize=64)
+def _parse_config(path: str, mtime_ns: int | None) -> dict:
+    return load_json(path)
+
+
+def _read_config(path: str) -> dict:
+    """Parses a JSON config file, re-reading it only when it has changed on disk."""
+    return _parse_config(path, _mtime_ns(path))
+
+
+@lru_cache(maxsize=64)
+def _parse_text(path: str, mtime_ns: int | None) -> str | None:
+    if mtime_ns is None:
+        return None
+    try:
+        with open(path, 'rb') as file:
+            return file.read().decode('utf-8')
+    except FileNotFoundError:
+        return None
+
+
+def _read_text(path: str) -> str | None:
+    """Reads a text file, or returns None if it does not exist. Re-read only when it has changed."""
+    return _parse_text(path, _mtime_ns(path))
+
+
+@lru_cache(maxsize=64)
+def _parse_memory(path: str, mtime_ns: int | None) -> tuple[dict, ...]:
+    if mtime_ns is None:
+        return ()
+    try:
+        memory = load_json(path)
+    except (FileNotFoundError, JSONDecodeError):
+        # Silence errors for missing files as memories are optional
+        return ()
+    
+    # Normalize output to a sequence of entries
+    if isinstance(memory, dict):
+        return (memory,)
+    elif isinstance(memory, list):
+        return tuple(memory)
+    return ()
+
+
+def _read_memory(path: str) -> tuple[dict, ...]:
+    """
+    Parses a memory file into a tuple of entries, re-reading it only when it has changed.
+    Missing or malformed files yield no memories. The entries are shared; copy before handing out.
+    """
+    return _parse_memory(path, _mtime_ns(path))
+
 
 class Character:
     """
@@ -9,6 +74,9 @@ class Character:
     
     def __init__(self, config_path: str):
         self.config_path = config_path
+        # Derived paths are fixed after construction; load_memory() runs every turn.
+        self._config_dir = os.path.dirname(config_path)
+        self._memory_path = os.path.join(self._config_dir, "temp_memory.json")
         self.id: str = "000"
         self.name: str = "Unknown"
         self.background: str = ""
@@ -17,6 +85,8 @@ class Character:
         self.current_location: str | None = None
         self.activity_status: str = "IDLE"  # Valid statuses: IDLE, TALKING, MOVING
         self.activity_data: dict = {}      # Stores contextual data for the current status
+        # GameCore that indexes this character by location; set by GameCore.add_characters().
+        self._game = None
         
         self._load_config()
 
@@ -24,23 +94,19 @@ class Character:
         """
         Parses the character's JSON configuration and loads the associated background story.
         """
-        with open(self.config_path, 'r', encoding='utf-8') as file:
-            config = json.load(file)
-            self.id = config.get('id', '000')
-            self.name = config.get('name', 'Unknown')
-            
-            # Resolve the background story file path relative to the config file
-            bg_filename = config.get('background', 'No background provided.')
-            bg_path = os.path.join(os.path.dirname(self.config_path), bg_filename)
-            
-            if os.path.exists(bg_path):
-                with open(bg_path, 'r', encoding='utf-8') as bg_file:
-                    self.background = bg_file.read()
-            else:
-                self.background = 'No background provided.'
-            
-            # Initialize starting location from config
-            self.current_location = config.get('initial_location', None)
+        config = _read_config(self.config_path)
+        self.id = config.get('id', '000')
+        self.name = config.get('name', 'Unknown')
+        
+        # Resolve the background story file path relative to the config file
+        bg_filename = config.get('background', 'No background provided.')
+        bg_path = os.path.join(self._config_dir, bg_filename)
+        
+        background = _read_text(bg_path)
+        self.background = background if background is not None else 'No background provided.'
+        
+        # Initialize starting location from config
+        self.current_location = config.get('initial_location', None)
 
     def print_info(self):
         """Debug helper to print character details to the console."""
@@ -51,32 +117,26 @@ class Character:
         return message
 
     def move(self, new_location: str):
-        """Updates the character's physical position in the world."""
-        self.current_location = new_location
+        """
+        Updates the character's physical position in the world.
+        Once registered with a GameCore, the move goes through GameCore.move_character() to keep its index in sync.
+        """
+        if self._game is not None:
+            self._game.move_character(self, new_location)
+        else:
+            self.current_location = new_location
     
     def load_memory(self) -> list[dict]:
         """
         Retrieves recent event summaries or 'memories' for this character.
         If a 'temp_memory.json' file exists in the character's config directory, 
-        it is loaded and parsed.
+        it is loaded and parsed. The file is re-parsed only when it changes on disk,
+        and each call returns fresh copies of the entries.
         
         Returns:
             list[dict]: A list of memory entries, each typically containing 'time' and 'content'.
         """
-        memory_path = os.path.join(os.path.dirname(self.config_path), "temp_memory.json")
-        try:
-            with open(memory_path, 'r', encoding='utf-8') as f:
-                memory = json.load(f)
-                
-                # Normalize output to a list
-                if isinstance(memory, dict):
-                    return [memory]
-                elif isinstance(memory, list):
-                    return memory
-                return []
-        except (FileNotFoundError, json.JSONDecodeError):
-            # Silence errors for missing files as memories are optional
-            return []
+        return [dict(entry) if isinstance(entry, dict) else entry for entry in _read_memory(self._memory_path)]
 
 # --- Debug Entry Point ---
 if __name__ == "__main__":
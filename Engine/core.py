@@ -1,7 +1,33 @@
-import json
 import os
+from bisect import insort
+from collections import defaultdict, deque
+from types import MappingProxyType
 from .character import Character
 from .item import Item
+from .json_loader import dumps_json, load_json
+
+# Dialogue events routed into the addressee's mailbox (and reported back in the agent's feedback).
+MAILBOX_ACTIONS = frozenset({"开始说话", "说话", "继续说话", "结束说话"})
+
+# Grid direction vector mapping, in the order directions are offered to agents.
+DIRECTION_DELTAS: MappingProxyType[str, tuple[int, int]] = MappingProxyType({
+    "上": (0, 1),   # North (+Y)
+    "下": (0, -1),  # South (-Y)
+    "左": (-1, 0),  # West (-X)
+    "右": (1, 0),   # East (+X)
+})
+
+# Action Availability Rules:
+# Defines which actions are theoretically possible at each location.
+# This is a static world rule set used to filter agent options. It is immutable,
+# so every GameCore shares it; tuples keep the order in which options are offered to agents.
+_ACTION_RULES_BY_LOCATION: MappingProxyType[str, tuple[str, ...]] = MappingProxyType({
+    "家": ("说话", "移动", "保持沉默", "睡觉", "查看地图"),
+    "医院": ("说话", "移动", "保持沉默", "查看地图"),
+    "小明家": ("说话", "移动", "保持沉默", "查看地图"),
+    "超市": ("说话", "移动", "保持沉默", "交易", "查看地图"),
+    "ATM": ("说话", "移动", "保持沉默", "查看地图"),
+})
 
 class GameCore:
     """
@@ -15,42 +41,96 @@ class GameCore:
     - Providing a central event log for all world activities.
     """
     
-    def __init__(self, map_config_path: str = "Configs/map/map.json"):
+    def __init__(self, map_config_path: str = "Configs/map/map.json", event_log_path: str | None = None):
         self.initialized = False
         self.characters: list[Character] = []
+        # Lookup indexes over `characters`, maintained by add_characters().
+        self._characters_by_id: dict[str, Character] = {}
+        self._characters_by_name: dict[str, Character] = {}
+        # Characters bucketed by current location, each bucket in roster order.
+        # Maintained by add_characters() and move_character(); registered characters route
+        # Character.move() through the latter, so assign `current_location` directly only before registering.
+        self._characters_by_location: defaultdict[str | None, list[Character]] = defaultdict(list)
+        # id(character) -> position in `characters`, the sort key of the location buckets.
+        self._roster_positions: dict[int, int] = {}
         self.items: list[Item] = []
+        # Items bucketed by location, maintained by add_items() and move_item().
+        self._items_by_location: defaultdict[str, list[Item]] = defaultdict(list)
+        # Per location, item name -> first item placed there under that name.
+        self._items_by_location_by_name: defaultdict[str, dict[str, Item]] = defaultdict(dict)
         
-        # World Map: A mapping of location names to their [x, y] grid coordinates.
-        self.game_map: dict[str, list[int]] = {}
+        # World Map: A mapping of location names to their (x, y) grid coordinates.
+        self.game_map: dict[str, tuple[int, int]] = {}
         self.map_config_path = map_config_path
+        # Reverse lookup of game_map: (x, y) -> location name. Rebuilt whenever the map is loaded.
+        self._coord_index: dict[tuple[int, int], str] = {}
+        # Location name -> {direction: neighbouring location} for every direction that leads somewhere.
+        self._adjacency: dict[str, dict[str, str]] = {}
+        # Read-only view of game_map handed to consumers that must not mutate it.
+        self._map_view: MappingProxyType[str, tuple[int, int]] = MappingProxyType(self.game_map)
+        # Location names in declaration order. Immutable, so it is handed out without copying.
+        self._locations: tuple[str, ...] = ()
 
-        # Action Availability Rules:
-        # Defines which actions are theoretically possible at each location.
-        # This is a static world rule set used to filter agent options.
-        self.action_rules_by_location: dict[str, list[str]] = {
-            "家": ["说话", "移动", "保持沉默", "睡觉", "查看地图"],
-            "医院": ["说话", "移动", "保持沉默", "查看地图"],
-            "小明家": ["说话", "移动", "保持沉默", "查看地图"],
-            "超市": ["说话", "移动", "保持沉默", "交易", "查看地图"],
-            "ATM": ["说话", "移动", "保持沉默", "查看地图"],
-        }
+        # Action Availability Rules (shared, read-only; see _ACTION_RULES_BY_LOCATION).
+        self.action_rules_by_location = _ACTION_RULES_BY_LOCATION
 
         # Central Event log: A chronologically ordered list of every action taken in the world.
+        # It stays a list, since consumers keep integer cursors into it and slice from them.
         self.event_log: list[dict] = []
+        
+        # Optional append-only JSONL copy of the log (one event per line), opened on the first event.
+        # The file is never truncated: every GameCore built for the same path (e.g. one per demo reset)
+        # appends its run after the previous ones. Call close() when the core is discarded.
+        self.event_log_path = event_log_path
+        self._event_log_file = None
+        
+        # Per-character mailboxes of the dialogue events addressed to them (by name) since their last drain.
+        # Filled by record_event() so agents read their messages without scanning the log. Unbounded:
+        # drain_incoming() empties a mailbox every turn, and no message may be dropped before then.
+        self.incoming_by_character: defaultdict[str, deque[dict]] = defaultdict(deque)
+        # Running total of dialogue events ever addressed to each character. Unlike the mailbox it
+        # is never drained or truncated, so schedulers can compare it to a saved count to detect new speech.
+        self.incoming_count_by_character: defaultdict[str, int] = defaultdict(int)
+
+        # Bumped whenever a character spawns or changes location; lets callers invalidate derived caches.
+        self.roster_version: int = 0
+        # Bumped whenever items are placed or relocated.
+        self.items_version: int = 0
 
     def load_map_from_config(self):
         """
         Loads the map geometry from a JSON configuration file.
         Resolves the path relative to the project root.
         """
-        if os.path.isabs(self.map_config_path):
-            config_path = self.map_config_path
-        else:
-            # Resolved relative to the parent directory of this file (Engine/)
-            config_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), self.map_config_path)
+        config_path = self._resolve_path(self.map_config_path)
+        
+        # Coordinates are stored as immutable (x, y) tuples; they double as reverse-index keys.
+        self.game_map = {name: (coords[0], coords[1]) for name, coords in load_json(config_path).items()}
+        self._map_view = MappingProxyType(self.game_map)
+        self._locations = tuple(self.game_map)
+        
+        # The first location declared at a coordinate wins, matching the former linear scan.
+        self._coord_index = {}
+        for name, coords in self.game_map.items():
+            self._coord_index.setdefault(coords, name)
         
-        with open(config_path, 'r', encoding='utf-8') as f:
-            self.game_map = json.load(f)
+        # The map is static once loaded, so neighbours are resolved once here instead of per query.
+        self._adjacency = {}
+        for name, (x, y) in self.game_map.items():
+            neighbours = {}
+            for label, (dx, dy) in DIRECTION_DELTAS.items():
+                destination = self._coord_index.get((x + dx, y + dy))
+                if destination is not None:
+                    neighbours[label] = destination
+            self._adjacency[name] = neighbours
+
+    @staticmethod
+    def _resolve_path(path: str) -> str:
+        """Resolves a configured path relative to the project root."""
+        if os.path.isabs(path):
+            return path
+        # Resolved relative to the parent directory of this file (Engine/)
+        return os.path.join(os.path.dirname(os.path.dirname(__file__)), path)
 
     def set_map(self):
         """Deprecated: Retained for backward compatibility. Use load_map_from_config()."""
@@ -58,27 +138,126 @@ class GameCore:
 
     def add_characters(self, characters: list[Character]):
         """Registers a list of character instances with the game engine."""
-        self.characters.extend(characters)
+        for c in characters:
+            # The first registration wins, matching the former linear scan.
+            self._characters_by_id.setdefault(c.id, c)
+            self._characters_by_name.setdefault(c.name, c)
+            self._roster_positions.setdefault(id(c), len(self.characters))
+            self.characters.append(c)
+            self._characters_by_location[c.current_location].append(c)
+            c._game = self
+        self.roster_version += 1
+
+    def move_character(self, character: Character, new_location: str):
+        """Relocates a character and invalidates location-derived caches."""
+        self._characters_by_location[character.current_location].remove(character)
+        character.current_location = new_location
+        # Insert in roster order so option lists do not depend on arrival order.
+        positions = self._roster_positions
+        insort(self._characters_by_location[new_location], character, key=lambda c: positions[id(c)])
+        self.roster_version += 1
+
+    def record_event(self, event: dict):
+        """
+        Appends an event to the central log and routes dialogue to the addressee's mailbox.
+        Dialogue events gain a resolved `target` field, so readers need not reconcile
+        `args["目标"]` with `target_override` themselves.
+        """
+        target = None
+        if event.get("action") in MAILBOX_ACTIONS:
+            target = (event.get("args") or {}).get("目标") or event.get("target_override")
+            if target:
+                event["target"] = target
+        self.event_log.append(event)
+        if self.event_log_path is not None:
+            if self._event_log_file is None:
+                # Line-buffered so every event reaches the file as soon as it is recorded.
+                self._event_log_file = open(self._resolve_path(self.event_log_path), "a", encoding="utf-8", buffering=1)
+            self._event_log_file.write(dumps_json(event) + "\n")
+        if target:
+            self.incoming_by_character[target].append(event)
+            self.incoming_count_by_character[target] += 1
+
+    def close(self):
+        """
+        Closes the event-log file, if one was opened.
+        Call it before discarding a core; a later core for the same path appends to the file.
+        """
+        if self._event_log_file is not None:
+            self._event_log_file.close()
+            self._event_log_file = None
+
+    def get_incoming_count(self, character_name: str) -> int:
+        """Returns how many dialogue events have been addressed to a character so far."""
+        return self.incoming_count_by_character.get(character_name, 0)
+
+    def drain_incoming(self, character_name: str) -> list[dict]:
+        """Returns and clears the dialogue events addressed to a character since the last drain."""
+        mailbox = self.incoming_by_character.get(character_name)
+        if not mailbox:
+            return []
+        events = list(mailbox)
+        mailbox.clear()
+        return events
 
     def add_items(self, items: list[Item]):
         """Registers a list of item instances with the game engine."""
-        self.items.extend(items)
+        for item in items:
+            self.items.append(item)
+            self._items_by_location[item.location].append(item)
+            self._items_by_location_by_name[item.location].setdefault(item.name, item)
+        self.items_version += 1
+
+    def move_item(self, item: Item, new_location: str):
+        """Relocates an item, keeping the location index consistent."""
+        old_bucket = self._items_by_location[item.location]
+        old_bucket.remove(item)
+        by_name = self._items_by_location_by_name[item.location]
+        if by_name.get(item.name) is item:
+            # Fall back to the next item left behind under the same name, if any.
+            del by_name[item.name]
+            for other in old_bucket:
+                if other.name == item.name:
+                    by_name[item.name] = other
+                    break
+        
+        item.location = new_location
+        self._items_by_location[new_location].append(item)
+        self._items_by_location_by_name[new_location].setdefault(item.name, item)
+        self.items_version += 1
 
     def get_items_at_location(self, location: str) -> list[Item]:
         """Returns all items placed at the specified location."""
         if not self.initialized:
             raise RuntimeError("GameCore must be initialized before accessing world data.")
-        return [item for item in self.items if item.location == location]
+        # Copied so callers keep receiving a fresh list.
+        return list(self._items_by_location.get(location, ()))
 
-    def get_locations(self) -> list[str]:
-        """Returns a list of all defined location names in the world."""
+    def location_has_items(self, location: str) -> bool:
+        """Checks whether any item is placed at the specified location."""
         if not self.initialized:
             raise RuntimeError("GameCore must be initialized before accessing world data.")
-        return list(self.game_map.keys())
-    
-    def get_location_coordinates(self, location_name: str) -> list[int]:
+        return bool(self._items_by_location.get(location))
+
+    def get_item_at_location_by_name(self, location: str, item_name: str) -> Item | None:
+        """Returns the item with the given name at the specified location, or None if absent."""
+        if not self.initialized:
+            raise RuntimeError("GameCore must be initialized before accessing world data.")
+        by_name = self._items_by_location_by_name.get(location)
+        return by_name.get(item_name) if by_name else None
+
+    def get_locations(self) -> tuple[str, ...]:
+        """
+        Returns all defined location names in the world, in declaration order.
+        The tuple is built once at map load and shared; it is never copied.
+        """
+        if not self.initialized:
+            raise RuntimeError("GameCore must be initialized before accessing world data.")
+        return self._locations
+
+    def get_location_coordinates(self, location_name: str) -> tuple[int, int]:
         """
-        Retrieves the [x, y] coordinates for a given location name.
+        Retrieves the (x, y) coordinates for a given location name.
         """
         if not self.initialized:
             raise RuntimeError("GameCore must be initialized before accessing world data.")
@@ -86,16 +265,32 @@ class GameCore:
             raise KeyError(f"Location '{location_name}' is not defined in the world map.")
         return self.game_map[location_name]
     
+    def get_adjacent_locations(self, location_name: str) -> dict[str, str]:
+        """
+        Returns {direction: location} for the grid neighbours of a location.
+        The mapping is shared; callers must not mutate it.
+        """
+        if not self.initialized:
+            raise RuntimeError("GameCore must be initialized before accessing world data.")
+        try:
+            return self._adjacency[location_name]
+        except KeyError:
+            raise KeyError(f"Location '{location_name}' is not defined in the world map.") from None
+    
+    def try_step(self, location_name: str, direction: str) -> str | None:
+        """
+        Returns the location one step from `location_name` in `direction`, or None if nothing is there.
+        A None result doubles as the invalid-direction signal for movement.
+        """
+        return self.get_adjacent_locations(location_name).get(direction)
+    
     def has_location_at_coordinates(self, x: int, y: int) -> bool:
         """
         Checks if any location exists at the specified grid coordinates.
         """
         if not self.initialized:
             raise RuntimeError("GameCore must be initialized before accessing world data.")
-        for coords in self.game_map.values():
-            if coords[0] == x and coords[1] == y:
-                return True
-        return False
+        return (x, y) in self._coord_index
     
     def get_location_name_at_coordinates(self, x: int, y: int) -> str | None:
         """
@@ -103,19 +298,17 @@ class GameCore:
         """
         if not self.initialized:
             raise RuntimeError("GameCore must be initialized before accessing world data.")
-        for name, coords in self.game_map.items():
-            if coords[0] == x and coords[1] == y:
-                return name
-        return None
+        return self._coord_index.get((x, y))
     
     def get_map_info(self) -> dict:
         """
         Provides a comprehensive summary of the world map structure.
+        `locations` is a read-only view of the map rather than a copy.
         """
         if not self.initialized:
             raise RuntimeError("GameCore must be initialized before accessing world data.")
         return {
-            "locations": dict(self.game_map),
+            "locations": self._map_view,
             "total_locations": len(self.game_map)
         }
 
@@ -125,23 +318,35 @@ class GameCore:
             raise RuntimeError("GameCore must be initialized before accessing world data.")
         return list(self.characters)
 
+    def get_characters_at_location(self, location: str) -> list[Character]:
+        """Returns the characters currently at the specified location, in roster order."""
+        if not self.initialized:
+            raise RuntimeError("GameCore must be initialized before accessing world data.")
+        return list(self._characters_by_location.get(location, ()))
+
+    def has_character_at(self, location: str, character_name: str) -> bool:
+        """Checks whether a character with the given name is at the specified location."""
+        if not self.initialized:
+            raise RuntimeError("GameCore must be initialized before accessing world data.")
+        return any(c.name == character_name for c in self._characters_by_location.get(location, ()))
+
     def get_character_by_id(self, character_id: str) -> Character:
         """Locates a character by their unique ID."""
         if not self.initialized:
             raise RuntimeError("GameCore must be initialized before accessing world data.")
-        for c in self.characters:
-            if c.id == character_id:
-                return c
-        raise KeyError(f"No character found with ID: {character_id}")
+        try:
+            return self._characters_by_id[character_id]
+        except KeyError:
+            raise KeyError(f"No character found with ID: {character_id}") from None
 
     def get_character_by_name(self, character_name: str) -> Character:
         """Locates a character by their display name."""
         if not self.initialized:
             raise RuntimeError("GameCore must be initialized before accessing world data.")
-        for c in self.characters:
-            if c.name == character_name:
-                return c
-        raise KeyError(f"No character found with name: {character_name}")
+        try:
+            return self._characters_by_name[character_name]
+        except KeyError:
+            raise KeyError(f"No character found with name: {character_name}") from None
 
     def initialize(self):
         """
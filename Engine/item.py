@@ -1,4 +1,4 @@
-import json
+from Engine.json_loader import load_json
 
 class Item:
     """
@@ -17,11 +17,10 @@ class Item:
         self._load_config()
 
     def _load_config(self):
-        with open(self.config_path, 'r', encoding='utf-8') as file:
-            config = json.load(file)
-            self.id = config.get('id', '000')
-            self.name = config.get('name', 'Unknown')
-            self.description = config.get('description', 'No description provided.')
+        config = load_json(self.config_path)
+        self.id = config.get('id', '000')
+        self.name = config.get('name', 'Unknown')
+        self.description = config.get('description', 'No description provided.')
 
     def print_info(self):
         print(f"ID: {self.id}\nItem Name: {self.name}\nLocation: {self.location}\nDescription: {self.description}")
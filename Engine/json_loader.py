@@ -0,0 +1,51 @@
+"""
+JSON loading shared by the engine's config, map and memory readers,
+plus the serializers used for the optional event-log file and the demo's API responses.
+
+Files are read as raw bytes in one call and parsed with `orjson` when it is
+installed, falling back to the standard library otherwise. Both parsers
+decode UTF-8 bytes directly, so no text-mode decode pass is needed.
+"""
+
+from pathlib import Path
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # Optional accelerator
+    orjson = None
+
+import json
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers can catch this either way.
+JSONDecodeError = json.JSONDecodeError
+
+
+def load_json(path: str | Path) -> Any:
+    """Reads and parses a JSON file."""
+    data = Path(path).read_bytes()
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _default(obj: Any) -> Any:
+    """Serializes read-only mapping views (e.g. map info in events) as plain objects."""
+    try:
+        return dict(obj)
+    except (TypeError, ValueError):
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable") from None
+
+
+def dumps_json(obj: Any) -> str:
+    """Serializes `obj` to a compact single-line JSON string, keeping non-ASCII text readable."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default)
+
+
+def dumps_json_bytes(obj: Any) -> bytes:
+    """Serializes `obj` like dumps_json(), as UTF-8 bytes ready to be written to a response body."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
@@ -1,28 +1,111 @@
+import sys
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+from types import MappingProxyType
+from typing import Callable, Iterator
 from .core import GameCore
 from .character import Character
 
+# Entry-point actions are offered to the UI/LLM under their specific "Start" variants.
+# apply_action also accepts the bare names as legacy aliases of the variants when idle.
+_ENTRY_POINT_ACTIONS = {"说话": sys.intern("开始说话"), "移动": sys.intern("开始移动")}
+
+# Scoped focus of every GameState, per execution context: {weakref to GameState: character name}.
+# It lets concurrently running agents (threads or asyncio tasks) each keep their own focus.
+# Mappings are never mutated in place: entering a scope installs a copy and leaving it resets the
+# token. Only weak references and names are held, so a context never keeps an engine alive.
+_SCOPED_FOCUS: ContextVar[MappingProxyType] = ContextVar("scoped_focus", default=MappingProxyType({}))
+
 class GameState:
     """
     Manages transient state and interaction logic for characters within the GameCore.
     Acts as the primary interface for agents to perceive and interact with the world.
     """
     
+    __slots__ = (
+        "game",
+        "_active_character_name",
+        "_ref",
+        "_nearby_cache_key",
+        "_nearby_cache_str",
+        "_idle_actions_rules",
+        "_idle_actions_by_location",
+        "_action_options_epoch",
+        "_action_options_cache",
+        "_action_handlers",
+        # Agents key their per-engine locks on the GameState through weak references.
+        "__weakref__",
+    )
+    
     def __init__(self, game: GameCore):
         self.game = game
+        # Focus set by set_active_character(), shared by every thread and task.
+        # active_character_scope() overrides it within the current context only.
         self._active_character_name: str | None = None
+        # Key of this GameState in the scoped-focus mappings.
+        self._ref = weakref.ref(self)
+        
+        # Joined nearby-character names, keyed on (actor id, location, roster version, separator).
+        self._nearby_cache_key: tuple | None = None
+        self._nearby_cache_str: str | None = None
+        
+        # Idle actions per location with entry points already remapped; rebuilt if the rule table is replaced.
+        self._idle_actions_rules: object = None
+        self._idle_actions_by_location: dict[str, tuple[str, ...]] = {}
+        
+        # Allowed actions as (ordered tuple, frozenset), keyed on (location, activity status).
+        # Shared by every character; dropped whenever items or the rule table change (the epoch).
+        self._action_options_epoch: tuple | None = None
+        self._action_options_cache: dict[tuple[str, str], tuple[tuple[str, ...], frozenset[str]]] = {}
+        
+        # Action name -> handler(actor, action, args), built once so apply_action dispatches in O(1).
+        handlers: dict[str, Callable[[Character, str, dict], str]] = {
+            "开始说话": self._handle_start_talk,
+            "说话": self._handle_talk,
+            "结束说话": self._handle_end_talk,
+            "开始移动": self._handle_start_move,
+            "移动": self._handle_move,
+            "结束移动": self._handle_end_move,
+            "交易": self._handle_trade,
+            "查看地图": self._handle_view_map,
+            "物品交互": self._handle_item_interaction,
+            "保持沉默": self._handle_idle,
+            "睡觉": self._handle_idle,
+        }
+        # Names are interned (see apply_action) so lookups of an interned action short-circuit on identity.
+        self._action_handlers = {sys.intern(name): handler for name, handler in handlers.items()}
 
     def set_active_character(self, character_name: str) -> None:
-        """Sets the context for subsequent queries and actions."""
+        """
+        Sets the context for subsequent queries and actions.
+        The focus is shared by every thread and task and stays until changed. Concurrent agents
+        should use active_character_scope() instead, which takes precedence within its block.
+        """
         # Verification ensures only valid characters are targeted.
         self.game.get_character_by_name(character_name)
         self._active_character_name = character_name
 
+    @contextmanager
+    def active_character_scope(self, character_name: str) -> Iterator[Character]:
+        """
+        Focuses the GameState on a character for the duration of the block, in the current context only.
+        Wrap a whole agent turn in it so individual workflow nodes do not need to re-set the context.
+        """
+        character = self.game.get_character_by_name(character_name)
+        token = _SCOPED_FOCUS.set(MappingProxyType({**_SCOPED_FOCUS.get(), self._ref: character_name}))
+        try:
+            yield character
+        finally:
+            _SCOPED_FOCUS.reset(token)
+
     @property
     def active_character(self) -> Character:
         """Returns the character object currently in focus."""
-        if self._active_character_name is None:
+        character_name = _SCOPED_FOCUS.get().get(self._ref, self._active_character_name)
+        if character_name is None:
             raise RuntimeError("Context Error: No active character has been set for the GameState.")
-        return self.game.get_character_by_name(self._active_character_name)
+        return self.game.get_character_by_name(character_name)
 
     def get_characters_options(self) -> list[str]:
         """
@@ -34,24 +117,37 @@ class GameState:
             raise ValueError(f"State Error: Character {actor.name} has no valid location.")
 
         # Logic: Characters must be in the same physical space to interact.
-        options: list[str] = []
-        for c in self.game.get_characters():
-            if c.id == actor.id:
-                continue
-            if c.current_location == actor.current_location:
-                options.append(c.name)
-        return options
-
-    def get_location_options(self) -> list[str]:
+        return [c.name for c in self.game.get_characters_at_location(actor.current_location) if c.id != actor.id]
+
+    def get_characters_options_joined(self, sep: str = "、") -> str:
+        """
+        Returns the nearby character names joined by `sep` (empty string when alone).
+        The result is cached until the actor, their location, or the roster changes.
+        """
+        actor = self.active_character
+        key = (actor.id, actor.current_location, self.game.roster_version, sep)
+        if key != self._nearby_cache_key:
+            self._nearby_cache_str = sep.join(self.get_characters_options())
+            self._nearby_cache_key = key
+        return self._nearby_cache_str
+
+    def get_location_options(self) -> tuple[str, ...]:
         """
         Returns all valid travel destinations excluding the character's current position.
         """
+        return tuple(self.iter_location_options())
+
+    def iter_location_options(self) -> Iterator[str]:
+        """
+        Lazily yields the travel destinations of `get_location_options`, for callers that only iterate.
+        The active character is resolved when the iterator is created.
+        """
         actor = self.active_character
         if actor.current_location is None:
             raise ValueError(f"State Error: Character {actor.name} has no valid location.")
 
-        locations = self.game.get_locations()
-        return [loc for loc in locations if loc != actor.current_location]
+        current_location = actor.current_location
+        return (loc for loc in self.game.get_locations() if loc != current_location)
     
     def get_items_in_location(self) -> list[str]:
         """
@@ -68,29 +164,13 @@ class GameState:
     def get_direction_options(self) -> list[str]:
         """
         Calculates valid movement directions (UP/DOWN/LEFT/RIGHT) based on grid geometry.
-        Verifies if an adjacent cell on the map contains a registered location.
+        Reads the neighbours the engine precomputed for the current location.
         """
         actor = self.active_character
         if actor.current_location is None:
             raise ValueError(f"State Error: Character {actor.name} has no valid location.")
         
-        current_coords = self.game.get_location_coordinates(actor.current_location)
-        x, y = current_coords
-        
-        # Grid direction vector mapping
-        directions = {
-            "上": (0, 1),   # North (+Y)
-            "下": (0, -1),  # South (-Y)
-            "左": (-1, 0),  # West (-X)
-            "右": (1, 0),   # East (+X)
-        }
-        
-        available = []
-        for label, (dx, dy) in directions.items():
-            if self.game.has_location_at_coordinates(x + dx, y + dy):
-                available.append(label)
-        
-        return available
+        return list(self.game.get_adjacent_locations(actor.current_location))
 
     def get_action_options(self) -> list[str]:
         """
@@ -98,12 +178,37 @@ class GameState:
         The available actions fluctuate based on the character's current 'activity_status'.
         This implements a simple finite state machine for character behavior.
         """
+        # Tuples are kept internally; a list is materialized only at the API boundary.
+        return list(self._cached_action_options()[0])
+
+    def get_action_options_set(self) -> frozenset[str]:
+        """The allowed actions as a set, for membership checks such as validation in apply_action()."""
+        return self._cached_action_options()[1]
+
+    def _cached_action_options(self) -> tuple[tuple[str, ...], frozenset[str]]:
+        """Returns the allowed actions for the actor's location and status, computing them once per pair."""
         actor = self.active_character
         if actor.current_location is None:
             raise ValueError(f"State Error: Character {actor.name} has no valid location.")
 
+        # Beyond location and status, the result only changes with the items or the rules.
+        epoch = (self.game.items_version, id(self.game.action_rules_by_location))
+        if epoch != self._action_options_epoch:
+            self._action_options_cache.clear()
+            self._action_options_epoch = epoch
+        
+        key = (actor.current_location, actor.activity_status)
+        cached = self._action_options_cache.get(key)
+        if cached is None:
+            options = tuple(sys.intern(action) for action in self._compute_action_options(actor))
+            cached = self._action_options_cache[key] = (options, frozenset(options))
+        return cached
+
+    def _compute_action_options(self, actor: Character) -> list[str]:
+        """Resolves the allowed actions for `get_action_options`."""
         # Check if items exist at current location (物品交互 is always available when items exist)
-        items_here = self.get_items_in_location()
+        # Only emptiness matters here, so no name list is built.
+        items_here = self.game.location_has_items(actor.current_location)
         
         # 1. Status-based overrides (Busy states)
         if actor.activity_status == "TALKING":
@@ -120,23 +225,24 @@ class GameState:
             return actions
 
         # 2. Location-based defaults (Idle states)
-        base_actions = list(self.game.action_rules_by_location.get(actor.current_location, []))
-        
-        # Remap entry-point actions to their specific "Start" variants for the UI/LLM.
-        remapped = []
-        for action in base_actions:
-            if action == "说话":
-                remapped.append("开始说话")
-            elif action == "移动":
-                remapped.append("开始移动")
-            else:
-                remapped.append(action)
+        remapped = self._idle_actions(actor.current_location)
         
         # Add item interaction if items exist at location
         if items_here:
-            remapped.append("物品交互")
+            return [*remapped, "物品交互"]
         
-        return remapped
+        return list(remapped)
+
+    def _idle_actions(self, location: str) -> tuple[str, ...]:
+        """Returns the location's idle actions with entry points remapped, computed once per location."""
+        rules = self.game.action_rules_by_location
+        if rules is not self._idle_actions_rules:
+            self._idle_actions_by_location = {
+                loc: tuple(_ENTRY_POINT_ACTIONS.get(action, action) for action in actions)
+                for loc, actions in rules.items()
+            }
+            self._idle_actions_rules = rules
+        return self._idle_actions_by_location.get(location, ())
 
     def apply_action(self, structured_output: dict) -> str:
         """
@@ -154,131 +260,121 @@ class GameState:
             raise TypeError("System Error: Action input must be a dictionary.")
             
         action = structured_output["action"]
-        args = structured_output.get("args", {})
+        # CJK literals are not interned automatically; interning lets set/dict probes below
+        # match the interned option and handler names by identity before comparing characters.
+        if isinstance(action, str):
+            action = sys.intern(action)
+        # Bound once; handlers receive it directly. A null `args` is treated as empty.
+        args = structured_output.get("args") or {}
 
         # Validation: Verify the action is legally permissible in the current state.
-        allowed = self.get_action_options()
+        # Canonical names pass on the first probe; otherwise legacy/shortcut names map to their entry points.
+        allowed = self.get_action_options_set()
         if action not in allowed:
-            # Legacy/Shortcut mapping for robust handling
-            if action == "说话": action = "开始说话"
-            elif action == "移动": action = "开始移动"
-            
+            action = _ENTRY_POINT_ACTIONS.get(action, action)
             if action not in allowed:
                 raise ValueError(f"Rule Violation: Action '{action}' is not permitted for {actor.name} right now.")
 
-        # --- Continuous State Transitions (FSM) ---
+        handler = self._action_handlers.get(action)
+        if handler is None:
+            raise KeyError(f"Fatal Error: Action handler for '{action}' is not implemented.")
+        return handler(actor, action, args)
+
+    def _log(self, actor: Character, action: str, args: dict, **extra) -> dict:
+        """
+        Records one event in the engine log and returns it.
+        Events stay plain dicts ({"actor", "action", "args", ...extra}); they are served
+        as JSON to the frontend and read with `.get` throughout.
+        """
+        event = {"actor": actor.name, "action": action, "args": args, **extra}
+        self.game.record_event(event)
+        return event
+
+    # --- Continuous State Transitions (FSM) ---
+
+    def _handle_start_talk(self, actor: Character, action: str, args: dict) -> str:
+        target = args["目标"]
+        if target == actor.name or not self.game.has_character_at(actor.current_location, target):
+            raise ValueError(f"Target Error: {target} is not present at this location.")
         
-        if action == "开始说话":
-            target = args["目标"]
-            if target not in self.get_characters_options():
-                raise ValueError(f"Target Error: {target} is not present at this location.")
-            
-            actor.activity_status = "TALKING"
-            actor.activity_data = {"target": target}
-            self.game.event_log.append({"actor": actor.name, "action": action, "args": args})
-            return f"你进入了与 {target} 的对话模式。你可以开始‘说话’，或在完成后‘结束说话’。"
-
-        if action == "说话":
-            target = actor.activity_data.get("target")
-            # Ensure context for the event log
-            if target and "目标" not in args:
-                args["目标"] = target
-                
-            self.game.event_log.append({
-                "actor": actor.name, 
-                "action": action, 
-                "args": args,
-                "target_override": target
-            })
-            return "" # Transparent action (no direct system feedback needed)
-
-        if action == "结束说话":
-            target = actor.activity_data.get("target")
-            if target and "目标" not in args:
-                args["目标"] = target
-                
-            actor.activity_status = "IDLE"
-            actor.activity_data = {}
-            self.game.event_log.append({
-                "actor": actor.name, 
-                "action": action, 
-                "args": args,
-                "target_override": target
-            })
-            return f"你结束了与 {target} 的对话。"
-
-        if action == "开始移动":
-            actor.activity_status = "MOVING"
-            actor.activity_data = {}
-            self.game.event_log.append({"actor": actor.name, "action": action, "args": args})
-            return "你进入了移动模式。请指定方向（上/下/左/右）进行移动。"
-
-        if action == "移动":
-            direction = args["方向"]
-            if direction not in self.get_direction_options():
-                raise ValueError(f"Movement Error: Cannot move '{direction}' from here.")
-            
-            # Retrieve coordinates and resolve destination
-            coords = self.game.get_location_coordinates(actor.current_location)
-            delta = {"上": (0, 1), "下": (0, -1), "左": (-1, 0), "右": (1, 0)}[direction]
-            new_loc_name = self.game.get_location_name_at_coordinates(coords[0] + delta[0], coords[1] + delta[1])
-            
-            if new_loc_name is None:
-                raise ValueError("Engine Error: Destination does not exist in world map.")
+        actor.activity_status = "TALKING"
+        # The status dict is reused across transitions rather than reallocated.
+        actor.activity_data.clear()
+        actor.activity_data["target"] = target
+        self._log(actor, action, args)
+        return f"你进入了与 {target} 的对话模式。你可以开始‘说话’，或在完成后‘结束说话’。"
+
+    def _handle_talk(self, actor: Character, action: str, args: dict) -> str:
+        target = actor.activity_data.get("target")
+        # Ensure context for the event log
+        if target:
+            args.setdefault("目标", target)
             
-            actor.move(new_loc_name)
-            actor.activity_data["last_destination"] = new_loc_name
+        self._log(actor, action, args, target_override=target)
+        return "" # Transparent action (no direct system feedback needed)
+
+    def _handle_end_talk(self, actor: Character, action: str, args: dict) -> str:
+        target = actor.activity_data.get("target")
+        if target:
+            args.setdefault("目标", target)
             
-            self.game.event_log.append({"actor": actor.name, "action": action, "args": args, "new_location": new_loc_name})
-            return f"你向 {direction} 移动，到达了 {new_loc_name}。"
-
-        if action == "结束移动":
-            final_loc = actor.activity_data.get("last_destination", actor.current_location)
-            actor.activity_status = "IDLE"
-            actor.activity_data = {}
-            self.game.event_log.append({"actor": actor.name, "action": action, "args": args})
-            return f"你停止了移动，目前的所在地是：{final_loc}。"
-
-        # --- Discrete Action Handlers ---
-
-        if action == "交易":
-            target = args["目标"]
-            if target not in self.get_characters_options():
-                raise ValueError(f"Target Error: {target} is not here.")
-            self.game.event_log.append({"actor": actor.name, "action": action, "args": args})
-            return f"你与 {target} 成功发起了交易。"
+        actor.activity_status = "IDLE"
+        actor.activity_data.clear()
+        self._log(actor, action, args, target_override=target)
+        return f"你结束了与 {target} 的对话。"
+
+    def _handle_start_move(self, actor: Character, action: str, args: dict) -> str:
+        actor.activity_status = "MOVING"
+        actor.activity_data.clear()
+        self._log(actor, action, args)
+        return "你进入了移动模式。请指定方向（上/下/左/右）进行移动。"
+
+    def _handle_move(self, actor: Character, action: str, args: dict) -> str:
+        direction = args["方向"]
+        # A single lookup both validates the direction and resolves the destination.
+        new_loc_name = self.game.try_step(actor.current_location, direction)
+        if new_loc_name is None:
+            raise ValueError(f"Movement Error: Cannot move '{direction}' from here.")
         
-        if action == "查看地图":
-            info = self.game.get_map_info()
-            self.game.event_log.append({"actor": actor.name, "action": action, "args": args, "map_info": info})
-            loc_list = ", ".join([f"{n} ({c})" for n, c in info["locations"].items()])
-            return f"【卫星地图】目前已感知的地点：{loc_list}"
-
-        if action == "物品交互":
-            target_item_name = args["目标"]
-            items_at_location = self.game.get_items_at_location(actor.current_location)
-            
-            target_item = None
-            for item in items_at_location:
-                if item.name == target_item_name:
-                    target_item = item
-                    break
-            
-            if target_item is None:
-                raise ValueError(f"Item Error: {target_item_name} is not present at this location.")
-            
-            self.game.event_log.append({
-                "actor": actor.name, 
-                "action": action, 
-                "args": args,
-                "item_id": target_item.id,
-                "item_description": target_item.description
-            })
-            return f"【物品观察】{target_item.name}：{target_item.description}"
-
-        if action in {"保持沉默", "睡觉"}:
-            self.game_core_event = {"actor": actor.name, "action": action, "args": args}
-            self.game.event_log.append(self.game_core_event)
-            return "你默默地观察着周围。" if action == "保持沉默" else "你休息了一段时间。"
-
-        raise KeyError(f"Fatal Error: Action handler for '{action}' is not implemented.")
\ No newline at end of file
+        self.game.move_character(actor, new_loc_name)
+        actor.activity_data["last_destination"] = new_loc_name
+        
+        self._log(actor, action, args, new_location=new_loc_name)
+        return f"你向 {direction} 移动，到达了 {new_loc_name}。"
+
+    def _handle_end_move(self, actor: Character, action: str, args: dict) -> str:
+        final_loc = actor.activity_data.get("last_destination", actor.current_location)
+        actor.activity_status = "IDLE"
+        actor.activity_data.clear()
+        self._log(actor, action, args)
+        return f"你停止了移动，目前的所在地是：{final_loc}。"
+
+    # --- Discrete Action Handlers ---
+
+    def _handle_trade(self, actor: Character, action: str, args: dict) -> str:
+        target = args["目标"]
+        if target == actor.name or not self.game.has_character_at(actor.current_location, target):
+            raise ValueError(f"Target Error: {target} is not here.")
+        self._log(actor, action, args)
+        return f"你与 {target} 成功发起了交易。"
+
+    def _handle_view_map(self, actor: Character, action: str, args: dict) -> str:
+        info = self.game.get_map_info()
+        # Events are published as-is (event log, web API), so they carry a plain-dict snapshot of the map.
+        self._log(actor, action, args, map_info={**info, "locations": dict(info["locations"])})
+        loc_list = ", ".join([f"{n} ([{x}, {y}])" for n, (x, y) in info["locations"].items()])
+        return f"【卫星地图】目前已感知的地点：{loc_list}"
+
+    def _handle_item_interaction(self, actor: Character, action: str, args: dict) -> str:
+        target_item_name = args["目标"]
+        target_item = self.game.get_item_at_location_by_name(actor.current_location, target_item_name)
+        if target_item is None:
+            raise ValueError(f"Item Error: {target_item_name} is not present at this location.")
+        
+        self._log(actor, action, args, item_id=target_item.id, item_description=target_item.description)
+        return f"【物品观察】{target_item.name}：{target_item.description}"
+
+    def _handle_idle(self, actor: Character, action: str, args: dict) -> str:
+        # Shared by 保持沉默 and 睡觉.
+        self._log(actor, action, args)
+        return "你默默地观察着周围。" if action == "保持沉默" else "你休息了一段时间。"
\ No newline at end of file
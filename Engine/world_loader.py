@@ -6,12 +6,21 @@ It coordinates the reading of configuration files to build the GameCore,
 spawn characters, load items, and initialize the GameState.
 """
 
-import json
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 from Engine.core import GameCore
 from Engine.state_manager import GameState
 from Engine.character import Character
 from Engine.item import Item
+from Engine.json_loader import load_json
+
+
+def _spawn_character(path: str) -> tuple[Optional[Character], Optional[Exception]]:
+    """Instantiates a character, capturing the failure instead of raising so one bad entry does not abort the boot."""
+    try:
+        return Character(path), None
+    except Exception as e:
+        return None, e
 
 
 class WorldLoader:
@@ -35,8 +44,7 @@ class WorldLoader:
         """
         Reads the primary configuration file from disk.
         """
-        with open(self.world_config_path, 'r', encoding='utf-8') as f:
-            self.world_config = json.load(f)
+        self.world_config = load_json(self.world_config_path)
         return self.world_config
     
     def initialize_game_core(self) -> GameCore:
@@ -44,7 +52,9 @@ class WorldLoader:
         Instantiates the GameCore and initializes the map geometry.
         """
         map_path = self.world_config.get('map_config', 'Configs/map/map.json')
-        self.game_core = GameCore(map_config_path=map_path)
+        # Optional JSONL persistence of the full event history.
+        event_log_path = self.world_config.get('event_log_path')
+        self.game_core = GameCore(map_config_path=map_path, event_log_path=event_log_path)
         self.game_core.initialize()
         return self.game_core
     
@@ -55,18 +65,28 @@ class WorldLoader:
         character_configs = self.world_config.get('characters', [])
         self.characters = []
         
+        paths = []
         for char_entry in character_configs:
             path = char_entry.get('config_path')
             if not path:
                 print(f"Boot Warning: Character entry is missing 'config_path'. Skipping entry: {char_entry}")
                 continue
-            
-            try:
-                character = Character(path)
-                self.characters.append(character)
-                print(f"✓ Character Spawning: {character.name} (UID: {character.id}) at {character.current_location}")
-            except Exception as e:
-                print(f"❌ Spawning Error: Failed to load character at {path}. Error: {e}")
+            paths.append(path)
+        
+        if not paths:
+            return self.characters
+        
+        # Config and background reads are I/O bound, so they overlap across threads.
+        # `map` yields results in submission order, keeping the roster order of the config.
+        with ThreadPoolExecutor(max_workers=min(16, len(paths))) as executor:
+            results = list(executor.map(_spawn_character, paths))
+        
+        for path, (character, error) in zip(paths, results):
+            if error is not None:
+                print(f"❌ Spawning Error: Failed to load character at {path}. Error: {error}")
+                continue
+            self.characters.append(character)
+            print(f"✓ Character Spawning: {character.name} (UID: {character.id}) at {character.current_location}")
         
         return self.characters
     
@@ -7,6 +7,7 @@ let state = {
     characters: [], // List of active characters with their locations and status
     items: [],      // List of items with their locations
     events: [],     // chronological log of all simulation events
+    eventCursor: 0, // Server event-log index up to which 'events' is synchronised
     turn: 0,        // Current simulation step
     running: false, // UI playback status
     initialized: false
@@ -65,6 +66,7 @@ async function fetchState() {
         state.characters = data.characters || [];
         state.items = data.items || [];
         state.events = data.events || [];
+        state.eventCursor = data.next_cursor || state.events.length;
         state.turn = data.turn || 0;
 
         updateUI();
@@ -73,6 +75,27 @@ async function fetchState() {
     }
 }
 
+/**
+ * Fetches only what changed since the last synchronisation (new events and positions).
+ * The static map is loaded once by fetchState() and is not re-sent.
+ */
+async function fetchUpdates() {
+    try {
+        const response = await fetch(`/api/events?since=${state.eventCursor}`);
+        const data = await response.json();
+
+        state.characters = data.characters || [];
+        state.items = data.items || [];
+        state.events = state.events.concat(data.events || []);
+        state.eventCursor = data.next_cursor || state.events.length;
+        state.turn = data.turn || 0;
+
+        updateUI();
+    } catch (error) {
+        console.error('API Error: Failed to synchronise simulation updates.', error);
+    }
+}
+
 /**
  * Triggers a single turn progression on the server.
  * Disables interaction during the request to prevent race conditions.
@@ -84,7 +107,7 @@ async function stepSimulation() {
         const data = await response.json();
 
         if (data.success) {
-            await fetchState();
+            await fetchUpdates();
         }
 
         // Handle termination state
@@ -344,7 +367,7 @@ function renderEventLog() {
 
         // Add target for actions that have one
         if (isDialogue) {
-            const target = args['目标'] || event.target_override;
+            const target = event.target || args['目标'] || event.target_override;
             if (target) {
                 actionDescription = `${event.action} -> ${target}`;
             }
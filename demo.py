@@ -8,24 +8,39 @@ It provides:
 3. Integration between the simulation engine and the agent logic.
 """
 
+import asyncio
 import traceback
+import zlib
 from pathlib import Path
 from typing import Optional
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse, JSONResponse
 
 from Engine import load_world
-from Agent.graph import NPCAgent
+from Engine.json_loader import dumps_json_bytes
+from Agent.graph import AGENT_CHARACTER_IDS, NPCAgent
 
 # --- Application Setup ---
 
-app = FastAPI(title="Multi-Agent Simulation Interface")
+class EngineJSONResponse(JSONResponse):
+    """
+    JSON response rendered with the engine's serializer: orjson when installed, and
+    CJK text left unescaped either way.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps_json_bytes(content)
+
+
+app = FastAPI(title="Multi-Agent Simulation Interface", default_response_class=EngineJSONResponse)
 
 # Direct the server to serve visual assets and frontend logic from the Graphics directory.
-graphics_path = Path(__file__).parent / "Graphics"
-app.mount("/Graphics", StaticFiles(directory=graphics_path), name="graphics")
+# Resolved to absolute paths once at import, so serving never depends on the working directory.
+graphics_path = (Path(__file__).parent / "Graphics").resolve()
+index_html_path = str(graphics_path / "index.html")
+app.mount("/Graphics", StaticFiles(directory=str(graphics_path)), name="graphics")
 
 
 # --- Simulation Management ---
@@ -50,8 +65,13 @@ class SimulationState:
         self.max_turns = 30
         self.complete = False
         self.initialized = False
+        # Bumped on every (re)initialization so state validators never match across resets.
+        self.generation = 0
         
-        # Wake-up logic state: tracks which events have been processed for NPC002
+        # Serializes turns and resets: both mutate the world, and a step awaits LLM calls midway.
+        self.lock = asyncio.Lock()
+        
+        # Wake-up logic state: how many dialogue events addressed to NPC002 have been processed
         self.xiaohong_wakeup_cursor = 0
     
     def initialize(self):
@@ -59,25 +79,53 @@ class SimulationState:
         Initializes the simulation by loading the world configuration
         and instantiating agents for the primary characters.
         """
+        # Release the previous run's event-log file; the new core appends to the same path.
+        if self.game_core is not None:
+            self.game_core.close()
+        
         # Load world data (map, characters, starting positions)
         self.game_core, self.game_state, self.characters = load_world()
         self.agents = {}
         
         # Instantiate agents for the specific NPCs we want to control (小张 and 小红)
         for character in self.characters:
-            if character.id in ["001", "002"]:
+            if character.id in AGENT_CHARACTER_IDS:
                 agent = NPCAgent(character, self.game_state)
                 self.agents[character.id] = agent
         
+        # The map is static during a run. Coordinate tuples serialize as JSON arrays, so no copy is needed.
+        self._map_payload = self.game_core.game_map
+        # Identity fields never change either; only positions and status are refreshed per request.
+        self._character_entries = [{"id": c.id, "name": c.name} for c in self.characters]
+        self._item_entries = [{"id": item.id, "name": item.name} for item in self.game_core.items]
+        
         # Reset progress counters
         self.turn = 0
         self.complete = False
         self.xiaohong_wakeup_cursor = 0
+        self.generation += 1
         self.initialized = True
     
+    def state_etag(self) -> str:
+        """
+        Returns an HTTP entity tag for the current snapshot.
+        Built from what the payload is rendered from rather than assuming every change logs an event:
+        the engine's roster/item versions (positions), the event count, every character's activity
+        status, and the run's generation, turn and completion flag.
+        """
+        if not self.initialized:
+            self.initialize()
+        core = self.game_core
+        statuses = zlib.crc32("|".join(c.activity_status for c in self.characters).encode())
+        return (
+            f'"{self.generation}-{self.turn}-{int(self.complete)}-{core.roster_version}-'
+            f'{core.items_version}-{len(core.event_log)}-{statuses:08x}"'
+        )
+    
     def get_state_dict(self) -> dict:
         """
         Gathers current simulation data and returns it in a format suitable for JSON serialization.
+        Used for the initial snapshot; subsequent polls should use get_updates().
         
         Returns:
             dict: The current world state including map, characters, event log, and turn info.
@@ -86,30 +134,56 @@ class SimulationState:
             self.initialize()
         
         return {
-            "map": {name: list(coords) for name, coords in self.game_core.game_map.items()},
-            "characters": [
-                {
-                    "id": c.id, 
-                    "name": c.name, 
-                    "location": c.current_location,
-                    "status": c.activity_status
-                }
-                for c in self.characters
-            ],
-            "items": [
-                {
-                    "id": item.id,
-                    "name": item.name,
-                    "location": item.location
-                }
-                for item in self.game_core.items
-            ],
+            "map": self._map_payload,
+            "characters": self._characters_payload(),
+            "items": self._items_payload(),
             "events": list(self.game_core.event_log),
+            "next_cursor": len(self.game_core.event_log),
+            "turn": self.turn,
+            "complete": self.complete
+        }
+    
+    def get_updates(self, since: int = 0) -> dict:
+        """
+        Returns what changed since the client last synchronised.
+        
+        Args:
+            since: The `next_cursor` value of the previous response (index into the event log).
+            
+        Returns:
+            dict: Events recorded after `since`, the new cursor, and the mutable world state
+                  (character and item positions, turn info). The static map is omitted.
+        """
+        if not self.initialized:
+            self.initialize()
+        
+        event_log = self.game_core.event_log
+        return {
+            "characters": self._characters_payload(),
+            "items": self._items_payload(),
+            "events": event_log[since:],
+            "next_cursor": len(event_log),
             "turn": self.turn,
             "complete": self.complete
         }
     
-    def step(self) -> dict:
+    def _characters_payload(self) -> list[dict]:
+        """
+        Refreshes the mutable per-character state (location and activity) in the cached payload.
+        The lists are updated in place; responses serialize them immediately, so sharing is safe.
+        """
+        for entry, c in zip(self._character_entries, self.characters):
+            entry["location"] = c.current_location
+            entry["status"] = c.activity_status
+        return self._character_entries
+    
+    def _items_payload(self) -> list[dict]:
+        """Refreshes item locations in the cached payload."""
+        for entry, item in zip(self._item_entries, self.game_core.items):
+            entry["location"] = item.location
+        return self._item_entries
+    
+    async def step(self) -> dict:
         """
         Advances the simulation by one full turn.
         In each turn:
@@ -117,6 +191,10 @@ class SimulationState:
         2. NPC002 (Xiao Hong) checks if they were addressed and responds if necessary.
         3. Completion criteria are evaluated.
         
+        Agents run through the async workflow, so the server keeps answering other
+        requests while an LLM call is in flight. NPC002's turn depends on what NPC001
+        said, so the two agents are awaited one after the other.
+        
         Returns:
             dict: Success status and metadata about the turn.
         """
@@ -138,14 +216,11 @@ class SimulationState:
         zhang = zhang_agent.character
         
         # Step 1: Execute NPC001 (Xiao Zhang) logic
-        # We set the active character in game_state so the agent operates on its own context.
-        self.game_state.set_active_character(zhang.name)
+        # The active character is scoped in game_state so the agent operates on its own context.
         try:
             # Invoke the LangGraph workflow for 小张
-            zhang_agent.graph.invoke(
-                {},
-                {"configurable": {"thread_id": zhang.id}}
-            )
+            with self.game_state.active_character_scope(zhang.name):
+                await zhang_agent.graph.ainvoke({}, zhang_agent.run_config)
         except Exception as e:
             traceback.print_exc()
             return {"success": False, "message": f"NPC001 error: {str(e)}"}
@@ -153,31 +228,21 @@ class SimulationState:
         # Step 2: Reactive Logic for NPC002 (Xiao Hong)
         # Xiao Hong only wakes up if someone spoke to her in the events that occurred since her last check.
         if xiaohong_agent:
-            new_events = self.game_core.event_log[self.xiaohong_wakeup_cursor:]
-            
-            # Check if any event involves speaking to Xiao Hong
-            should_wake = any(
-                (ev.get("action") in ["说话", "开始说话", "继续说话", "结束说话"])
-                and (
-                    ev.get("args", {}).get("目标") == xiaohong_agent.character.name or
-                    ev.get("target_override") == xiaohong_agent.character.name
-                )
-                for ev in new_events
-            )
+            xiaohong_name = xiaohong_agent.character.name
+            # Check if anyone has spoken to Xiao Hong; the engine counts her incoming dialogue as it is recorded.
+            incoming_count = self.game_core.get_incoming_count(xiaohong_name)
+            should_wake = incoming_count > self.xiaohong_wakeup_cursor
             
             if should_wake:
-                self.game_state.set_active_character(xiaohong_agent.character.name)
                 try:
                     # Invoke the LangGraph workflow for 小红
-                    xiaohong_agent.graph.invoke(
-                        {},
-                        {"configurable": {"thread_id": xiaohong_agent.character.id}}
-                    )
+                    with self.game_state.active_character_scope(xiaohong_name):
+                        await xiaohong_agent.graph.ainvoke({}, xiaohong_agent.run_config)
                 except Exception as e:
                     traceback.print_exc()
             
             # Update the event cursor so we don't process the same messages twice
-            self.xiaohong_wakeup_cursor = len(self.game_core.event_log)
+            self.xiaohong_wakeup_cursor = self.game_core.get_incoming_count(xiaohong_name)
         
         # Step 3: Evaluate termination conditions
         # The demo ends if Xiao Zhang reaches the ATM or the turn limit is hit.
@@ -203,27 +268,42 @@ sim = SimulationState()
 @app.get("/")
 async def root():
     """Serves the main graphical user interface."""
-    return FileResponse(graphics_path / "index.html")
+    return FileResponse(index_html_path)
 
 
 @app.get("/api/state")
-async def get_state():
-    """Returns the current state of the simulation for the frontend to render."""
-    return JSONResponse(sim.get_state_dict())
+async def get_state(request: Request):
+    """
+    Returns the current state of the simulation for the frontend to render.
+    Answers 304 Not Modified when the client's cached snapshot is still current.
+    """
+    etag = sim.state_etag()
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return EngineJSONResponse(sim.get_state_dict(), headers={"ETag": etag})
+
+
+@app.get("/api/events")
+async def get_events(since: int = 0):
+    """Returns the events recorded after cursor `since`, plus current positions and turn info."""
+    return EngineJSONResponse(sim.get_updates(since))
 
 
 @app.post("/api/step")
 async def step_simulation():
     """Triggers a single turn progression in the simulation."""
-    result = sim.step()
-    return JSONResponse(result)
+    # Polls keep being served while a step awaits the LLM; only step/reset wait on each other.
+    async with sim.lock:
+        result = await sim.step()
+    return EngineJSONResponse(result)
 
 
 @app.post("/api/reset")
 async def reset_simulation():
     """Resets the simulation state to initial values."""
-    sim.reset()
-    return JSONResponse({"success": True, "message": "Simulation reset successfully"})
+    async with sim.lock:
+        sim.reset()
+    return EngineJSONResponse({"success": True, "message": "Simulation reset successfully"})
 
 
 # --- Server Entry Point ---
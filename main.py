@@ -6,13 +6,48 @@ without a web frontend. It is primarily used for testing and debugging the
 agent logic and engine interactions.
 """
 
+import sys
 import traceback
 from Engine import load_world
-from Agent.graph import NPCAgent
-
-def main():
+from langchain_core.messages import AIMessage, HumanMessage
+from Agent.graph import AGENT_CHARACTER_IDS, NPCAgent
+
+
+def _render_human_message(msg: HumanMessage) -> str:
+    """Summarizes sensory input or environmental updates for the execution trace."""
+    content = msg.content
+    _, marker, dialog = content.rpartition("[对话]")
+    if marker:
+        return f"      📥 [Received]: {dialog.strip()}"
+    # Show the first line mentioning the current location, located without splitting the content.
+    idx = content.find("当前位置")
+    if idx < 0:
+        return "      🌐 [System]: Status Update"
+    start = content.rfind("\n", 0, idx) + 1
+    end = content.find("\n", idx)
+    loc_str = content[start:end] if end >= 0 else content[start:]
+    return f"      🌐 [System]: {loc_str}"
+
+
+def _render_ai_message(msg: AIMessage) -> str:
+    """Summarizes the agent's chosen action and reasoning for the execution trace."""
+    content = msg.content
+    struct = msg.additional_kwargs.get("structured_output")
+    if struct is not None:
+        content = str(struct.model_dump()) if hasattr(struct, "model_dump") else str(struct)
+    return f"      🚀 [Action]: {content}"
+
+
+# Trace line builders by exact message type; other messages (e.g. system prompts) are not shown.
+_TRACE_RENDERERS = {
+    HumanMessage: _render_human_message,
+    AIMessage: _render_ai_message,
+}
+
+def main(verbose: bool = True):
     """
     Initializes the game world, creates NPC agents, and runs a test simulation.
+    With `verbose` off, per-turn message traces and the final event log are not printed.
     """
     print("=" * 60)
     print("      MULTI-AGENT SIMULATION - CLI DEBUGGER")
@@ -31,8 +66,7 @@ def main():
     print("-" * 60)
     print(f"Available Locations : {', '.join(game_core.get_locations())}")
     print(f"Active Characters   : {len(characters)}")
-    for char in characters:
-        print(f"  • {char.name:<10} (ID: {char.id}) at {char.current_location}")
+    print("\n".join(f"  • {char.name:<10} (ID: {char.id}) at {char.current_location}" for char in characters))
     print()
     
     # --- Agent Creation ---
@@ -42,7 +76,7 @@ def main():
     agents = {}
     # We create agents for NPC 001 (Xiao Zhang) and NPC 002 (Xiao Hong)
     for character in characters:
-        if character.id in ["001", "002"]: 
+        if character.id in AGENT_CHARACTER_IDS:
             agent = NPCAgent(character, game_state)
             agents[character.id] = agent
             print(f"✓ Created IQ agent for {character.name}")
@@ -58,57 +92,56 @@ def main():
     print("Objective: Xiao Zhang must visit Hospital, coordinate with Xiao Hong, then reach ATM.")
     print()
     
-    run_test_simulation(game_core, game_state, characters, agents)
+    try:
+        run_test_simulation(game_core, game_state, characters, agents, verbose=verbose)
+    finally:
+        game_core.close()
     
     return game_core, game_state, characters, agents
 
 
-def run_test_simulation(game_core, game_state, characters, agents):
+def run_test_simulation(game_core, game_state, characters, agents, verbose: bool = True):
     """
     Executes a turn-based simulation loop until an objective or turn limit is reached.
+    `verbose` controls the per-turn message traces and the final event log dump.
     """
 
+    # Number of history messages already traced per agent thread; the history only ever grows.
+    traced_counts: dict[str, int] = {}
+
     def _invoke_agent(agent: NPCAgent, label: str) -> None:
         """
         Executes a single workflow turn for a specific agent and prints formatted output.
         """
         print(f"🤖 [NODE: {label}] Character: {agent.character.name}")
         
-        # Execute the LangGraph workflow
-        result = agent.graph.invoke(
-            {},
-            {"configurable": {"thread_id": agent.character.id}},
-        )
-
-        # Print activity logs from the agent's memory
-        messages = result.get("messages", [])
+        # Execute the LangGraph workflow with the shared game_state focused on this agent.
+        # Streaming node updates reports progress as each node finishes instead of after the whole turn.
+        with game_state.active_character_scope(agent.character.name):
+            for update in agent.graph.stream({}, agent.run_config, stream_mode="updates"):
+                if verbose:
+                    for node_name in update:
+                        print(f"   ⏱ [{node_name}] done")
+
+        # Print the messages this turn added to the agent's memory; earlier ones were traced already.
+        # The trace is assembled first and written in one call.
+        lines = []
+        messages = agent.graph.get_state(agent.run_config).values.get("messages", []) if verbose else None
         if messages:
-            print("   📜 Execution Trace:")
-            for msg in messages:
-                role = msg.__class__.__name__.replace("Message", "")
-                content = msg.content
-                
-                if role == "Human":
-                    # Display sensory input or environmental updates
-                    if "[对话]" in content:
-                        dialog = content.split("[对话]")[-1].strip()
-                        print(f"      📥 [Received]: {dialog}")
-                    else:
-                        loc_match = [line for line in content.split("\n") if "当前位置" in line]
-                        loc_str = loc_match[0] if loc_match else "Status Update"
-                        print(f"      🌐 [System]: {loc_str}")
-                
-                elif role == "AI":
-                    # Display the agent's chosen action and reasoning
-                    if hasattr(msg, "additional_kwargs") and "structured_output" in msg.additional_kwargs:
-                        struct = msg.additional_kwargs["structured_output"]
-                        content = str(struct.model_dump()) if hasattr(struct, "model_dump") else str(struct)
-                    print(f"      🚀 [Action]: {content}")
+            start = traced_counts.get(agent.thread_id, 0)
+            traced_counts[agent.thread_id] = len(messages)
+            if start < len(messages):
+                lines.append("   📜 Execution Trace:")
+                for msg in messages[start:]:
+                    render = _TRACE_RENDERERS.get(type(msg))
+                    if render is not None:
+                        lines.append(render(msg))
         
         # Display updated status
         c = agent.character
-        print(f"   📊 Result: Loc={c.current_location} | Status={c.activity_status}")
-        print()
+        lines.append(f"   📊 Result: Loc={c.current_location} | Status={c.activity_status}")
+        lines.append("")
+        sys.stdout.write("\n".join(lines) + "\n")
 
     # Retrieve agents for the simulation loop
     zhang_agent = agents.get("001")
@@ -119,10 +152,11 @@ def run_test_simulation(game_core, game_state, characters, agents):
         return
 
     zhang = zhang_agent.character
+    xiaohong_name = xiaohong_agent.character.name
     max_turns = 30
     success = False
 
-    # Keeps track of events processed by Xiao Hong to avoid duplicate triggers
+    # Number of dialogue events addressed to Xiao Hong that she has already reacted to
     xiaohong_wakeup_cursor = 0
 
     print(f"Initial State: {zhang.name} is starting at {zhang.current_location}")
@@ -133,7 +167,6 @@ def run_test_simulation(game_core, game_state, characters, agents):
         print(f" [ TURN {turn} ] ".center(60, "="))
 
         # 1. Proactive Phase: Xiao Zhang (NPC001) always takes an action
-        game_state.set_active_character(zhang.name)
         try:
             _invoke_agent(zhang_agent, label="PROACTIVE_AGENT")
         except Exception as e:
@@ -142,18 +175,12 @@ def run_test_simulation(game_core, game_state, characters, agents):
             break
 
         # 2. Reactive Phase: Xiao Hong (NPC002) only acts if triggered by a dialogue event
-        new_events = game_core.event_log[xiaohong_wakeup_cursor :]
-        should_wake_xiaohong = any(
-            (ev.get("action") in ["说话", "开始说话", "继续说话", "结束说话"])
-            and (
-                ev.get("args", {}).get("目标") == xiaohong_agent.character.name or
-                ev.get("target_override") == xiaohong_agent.character.name
-            )
-            for ev in new_events
-        )
+        # The engine counts dialogue addressed to each character as events are recorded.
+        incoming_count = game_core.get_incoming_count(xiaohong_name)
+        should_wake_xiaohong = incoming_count > xiaohong_wakeup_cursor
 
         if should_wake_xiaohong:
-            print(f"🔔 reactive Trigger: {xiaohong_agent.character.name} detected incoming communication.")
+            print(f"🔔 reactive Trigger: {xiaohong_name} detected incoming communication.")
             try:
                 _invoke_agent(xiaohong_agent, label="REACTIVE_AGENT")
             except Exception as e:
@@ -162,7 +189,7 @@ def run_test_simulation(game_core, game_state, characters, agents):
                 break
         
         # Update cursor to mark events as processed
-        xiaohong_wakeup_cursor = len(game_core.event_log)
+        xiaohong_wakeup_cursor = game_core.get_incoming_count(xiaohong_name)
 
         # 3. Success Check: Has the target location been reached?
         reached_atm = zhang.current_location == "ATM"
@@ -182,13 +209,15 @@ def run_test_simulation(game_core, game_state, characters, agents):
     print(f"Total Actions  : {len(game_core.event_log)}")
     print("-" * 60)
     
-    print("Full Action Log History:")
-    for i, event in enumerate(game_core.event_log, 1):
-        actor = event.get('actor', 'System')
-        action = event.get('action', 'Unknown')
-        print(f"  {i:02d}. [{actor}] {action}")
+    if verbose:
+        print("Full Action Log History:")
+        print("\n".join(
+            f"  {i:02d}. [{event.get('actor', 'System')}] {event.get('action', 'Unknown')}"
+            for i, event in enumerate(game_core.event_log, 1)
+        ))
     print("=" * 60)
 
 
 if __name__ == "__main__":
-    main()
+    # Pass --quiet to skip the message traces and the full event log.
+    main(verbose="--quiet" not in sys.argv[1:])
@@ -0,0 +1,38 @@
+import json
+import os
+
+from Engine.character import Character
+
+
+def _make_character(tmp_path) -> Character:
+    (tmp_path / "background.txt").write_text("背景", encoding="utf-8")
+    config = {"id": "001", "name": "小明", "background": "background.txt", "initial_location": "家"}
+    (tmp_path / "npc.json").write_text(json.dumps(config), encoding="utf-8")
+    return Character(str(tmp_path / "npc.json"))
+
+
+def _write_memory(tmp_path, entries, mtime_ns: int):
+    path = tmp_path / "temp_memory.json"
+    path.write_text(json.dumps(entries, ensure_ascii=False), encoding="utf-8")
+    # Set the mtime explicitly so the test does not depend on filesystem timestamp resolution.
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_load_memory_picks_up_edits_to_the_memory_file(tmp_path):
+    character = _make_character(tmp_path)
+    assert character.load_memory() == []
+
+    _write_memory(tmp_path, [{"time": "1", "content": "早上"}], 1_000_000_000)
+    assert character.load_memory() == [{"time": "1", "content": "早上"}]
+
+    _write_memory(tmp_path, [{"time": "2", "content": "晚上"}], 2_000_000_000)
+    assert character.load_memory() == [{"time": "2", "content": "晚上"}]
+
+
+def test_load_memory_returns_copies(tmp_path):
+    character = _make_character(tmp_path)
+    _write_memory(tmp_path, {"time": "1", "content": "早上"}, 1_000_000_000)
+
+    character.load_memory()[0]["content"] = "改掉"
+
+    assert character.load_memory() == [{"time": "1", "content": "早上"}]
@@ -0,0 +1,54 @@
+import pytest
+
+pytest.importorskip("langgraph")
+
+from langchain_core.messages import AIMessage
+from langgraph.graph import END, START, MessagesState, StateGraph
+
+from Agent.checkpoint import EndOfWorkflowSaver
+
+
+class _TurnState(MessagesState):
+    system_prompt: str
+    env_snapshot: dict
+
+
+def _build_graph(saver: EndOfWorkflowSaver):
+    """Mirrors the NPC workflow: preprocess writes the prompt channels, the later nodes only messages."""
+    builder = StateGraph(_TurnState)
+    builder.add_node("preprocess", lambda state: {"system_prompt": "prompt", "env_snapshot": {"nearby": ""}})
+    builder.add_node("generate", lambda state: {"messages": [AIMessage(content="说话")]})
+    builder.add_node("postprocess", lambda state: {"messages": []})
+    builder.add_edge(START, "preprocess")
+    builder.add_edge("preprocess", "generate")
+    builder.add_edge("generate", "postprocess")
+    builder.add_edge("postprocess", END)
+    return builder.compile(checkpointer=saver)
+
+
+def test_state_after_one_turn_keeps_channels_of_earlier_nodes():
+    saver = EndOfWorkflowSaver()
+    graph = _build_graph(saver)
+    config = {"configurable": {"thread_id": "npc"}}
+
+    graph.invoke({}, config)
+
+    values = graph.get_state(config).values
+    assert values["system_prompt"] == "prompt"
+    assert values["env_snapshot"] == {"nearby": ""}
+    assert [m.content for m in values["messages"]] == ["说话"]
+
+
+def test_one_committed_checkpoint_per_turn_linked_to_the_previous_one():
+    saver = EndOfWorkflowSaver()
+    graph = _build_graph(saver)
+    config = {"configurable": {"thread_id": "npc"}}
+
+    graph.invoke({}, config)
+    first = graph.get_state(config)
+    graph.invoke({}, config)
+    second = graph.get_state(config)
+
+    assert len(list(graph.get_state_history(config))) == 2
+    assert second.parent_config["configurable"]["checkpoint_id"] == first.config["configurable"]["checkpoint_id"]
+    assert len(second.values["messages"]) == 2
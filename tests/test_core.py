@@ -0,0 +1,37 @@
+from Engine import load_world
+from Engine.core import GameCore
+
+
+def _speech(speaker: str, target: str, content: str) -> dict:
+    return {"character": speaker, "action": "说话", "args": {"目标": target, "内容": content}}
+
+
+def test_mailbox_keeps_every_message_since_the_last_drain():
+    core = GameCore()
+    for i in range(12):
+        core.record_event(_speech("小明", "小红", f"消息{i}"))
+
+    drained = core.drain_incoming("小红")
+
+    assert [e["args"]["内容"] for e in drained] == [f"消息{i}" for i in range(12)]
+    assert core.get_incoming_count("小红") == len(drained)
+    assert core.drain_incoming("小红") == []
+
+
+def test_moves_keep_location_buckets_in_roster_order():
+    game_core, _, (zhang, hong) = load_world()
+    game_core.move_character(hong, "超市")
+    game_core.move_character(zhang, "超市")
+    game_core.move_character(hong, "家")
+    game_core.move_character(hong, "超市")
+
+    assert game_core.get_characters_at_location("超市") == [zhang, hong]
+
+
+def test_character_move_keeps_the_engine_index_in_sync():
+    game_core, _, (zhang, _) = load_world()
+    zhang.move("超市")
+
+    assert zhang.current_location == "超市"
+    assert game_core.get_characters_at_location("超市") == [zhang]
+    assert zhang not in game_core.get_characters_at_location("家")
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("langgraph")
+
+from langchain_core.runnables import RunnableLambda
+
+import Agent.graph as graph
+from Engine import load_world
+
+
+def _offered(union_schema) -> dict:
+    """Maps each action name bound to the stub onto its schema."""
+    wrapped = "action" in union_schema.model_fields
+    schemas = union_schema.model_fields["action"].annotation.__args__ if wrapped else (union_schema,)
+    return {schema.model_fields["行动类型"].annotation.__args__[0]: schema for schema in schemas}
+
+
+def _choose(union_schema, action_name: str, **fields):
+    """Builds the structured reply selecting `action_name`."""
+    choice = _offered(union_schema)[action_name](行动类型=action_name, 内心="……", **fields)
+    return union_schema(action=choice) if "action" in union_schema.model_fields else choice
+
+
+class _ContendingLLM:
+    """小红 (moving) steps away at once; 小张 answers later, picking 小红 as the one to talk to."""
+
+    def with_structured_output(self, union_schema):
+        async def reply(messages):
+            if "移动" in _offered(union_schema):
+                return _choose(union_schema, "移动", 方向="右")
+            await asyncio.sleep(0.05)
+            return _choose(union_schema, "开始说话", 目标="小红")
+
+        return RunnableLambda(lambda messages: None, afunc=reply)
+
+
+def test_choice_outdated_by_a_concurrent_npc_becomes_feedback(monkeypatch):
+    monkeypatch.setattr(graph, "_get_llm", lambda: _ContendingLLM())
+    game_core, game_state, characters = load_world()
+    zhang, hong = characters
+    game_core.move_character(hong, zhang.current_location)
+    hong.activity_status = "MOVING"
+    agents = [graph.NPCAgent(zhang, game_state), graph.NPCAgent(hong, game_state)]
+
+    zhang_turn, hong_turn = asyncio.run(graph.run_all_npcs(agents))
+
+    assert hong.current_location == "超市"
+    assert zhang.activity_status == "IDLE"
+    assert "已不可选" in zhang_turn["messages"][-1].content
+    assert [e["action"] for e in game_core.event_log] == ["移动"]
+
+
+class _SilentLLM:
+    def with_structured_output(self, union_schema):
+        return RunnableLambda(lambda messages: _choose(union_schema, "保持沉默"))
+
+
+def test_agent_graph_accepts_the_character_id_as_thread(monkeypatch):
+    monkeypatch.setattr(graph, "_get_llm", lambda: _SilentLLM())
+    _, game_state, characters = load_world()
+    agent = graph.NPCAgent(characters[0], game_state)
+    config = {"configurable": {"thread_id": agent.character.id}}
+
+    with game_state.active_character_scope(agent.character.name):
+        agent.graph.invoke({}, config)
+
+    assert agent.graph.get_state(config).values == agent.graph.get_state(agent.run_config).values
+    assert agent.graph.get_state(config).values["messages"]
+
+
+def test_agent_graph_rejects_threads_of_other_agents():
+    _, game_state, characters = load_world()
+    zhang, hong = (graph.NPCAgent(c, game_state) for c in characters)
+
+    with pytest.raises(ValueError, match="does not belong to this agent"):
+        zhang.graph.invoke({}, hong.run_config)
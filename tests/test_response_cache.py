@@ -0,0 +1,52 @@
+import hashlib
+import random
+import time
+
+from Agent.response_cache import ResponseCache, simhash
+
+
+def _reference_simhash(text: str, ngram: int = 3) -> int:
+    """The straightforward per-gram, per-bit SimHash the optimized version must agree with."""
+    grams = [text] if len(text) < ngram else [text[i:i + ngram] for i in range(len(text) - ngram + 1)]
+    weights = [0] * 64
+    for gram in grams:
+        value = int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+def _chinese_text(rng: random.Random, length: int) -> str:
+    return "".join(chr(rng.randint(0x4E00, 0x9FFF)) for _ in range(length))
+
+
+def test_simhash_matches_the_reference_implementation():
+    rng = random.Random(0)
+    for length in (0, 1, 2, 3, 50, 2000):
+        text = _chinese_text(rng, length)
+        assert simhash(text) == _reference_simhash(text)
+
+
+def test_hit_is_never_returned_for_different_option_schemas():
+    cache = ResponseCache()
+    cache.store(("开始说话Action[小红]",), "你好", "reply")
+
+    assert cache.lookup(("开始说话Action[小红]",), "你好") == "reply"
+    assert cache.lookup(("开始说话Action[小明]",), "你好") is None
+
+
+def test_lookup_stays_cheap_on_a_full_cache():
+    # Benchmark: a miss against a full cache of KB-sized conversation tails must cost far less than
+    # the LLM call it would replace (hundreds of milliseconds).
+    rng = random.Random(1)
+    cache = ResponseCache(max_entries=256)
+    for i in range(256):
+        cache.store(("schemas", i % 8), _chinese_text(rng, 1000), i)
+    queries = [_chinese_text(rng, 1000) for _ in range(20)]
+
+    start = time.perf_counter()
+    for query in queries:
+        cache.lookup(("schemas", 0), query)
+    per_lookup = (time.perf_counter() - start) / len(queries)
+
+    assert per_lookup < 0.05
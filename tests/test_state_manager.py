@@ -0,0 +1,58 @@
+import asyncio
+import gc
+import threading
+import weakref
+
+from Engine import load_world
+
+
+def test_set_active_character_is_visible_from_other_threads():
+    _, game_state, _ = load_world()
+    game_state.set_active_character("小红")
+
+    seen = []
+    thread = threading.Thread(target=lambda: seen.append(game_state.active_character.name))
+    thread.start()
+    thread.join()
+
+    assert seen == ["小红"]
+
+
+def test_scope_overrides_and_restores_the_shared_focus():
+    _, game_state, _ = load_world()
+    game_state.set_active_character("小红")
+
+    with game_state.active_character_scope("小张"):
+        assert game_state.active_character.name == "小张"
+
+    assert game_state.active_character.name == "小红"
+
+
+def test_concurrent_scopes_keep_their_own_focus():
+    _, game_state, _ = load_world()
+
+    async def turn(name: str) -> list[str]:
+        with game_state.active_character_scope(name):
+            seen = []
+            for _ in range(3):
+                await asyncio.sleep(0)
+                seen.append(game_state.active_character.name)
+            return seen
+
+    async def main():
+        return await asyncio.gather(turn("小张"), turn("小红"))
+
+    assert asyncio.run(main()) == [["小张"] * 3, ["小红"] * 3]
+
+
+def test_focus_does_not_keep_a_discarded_game_state_alive():
+    _, game_state, _ = load_world()
+    game_state.set_active_character("小张")
+    with game_state.active_character_scope("小红"):
+        pass
+    ref = weakref.ref(game_state)
+
+    del game_state
+    gc.collect()
+
+    assert ref() is None
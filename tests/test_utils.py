@@ -0,0 +1,22 @@
+from Agent import utils
+
+
+class _Roster:
+    """Stands in for a GameState whose nearby characters are `names`."""
+
+    def __init__(self, names):
+        self.names = names
+
+
+def test_schema_caches_stay_bounded_across_many_rosters(monkeypatch):
+    monkeypatch.setitem(utils.DYNAMIC_OPTIONS_REGISTRY, "get_characters", lambda state: state.names)
+    talk = utils.get_action_definition("开始说话")
+
+    first = talk.build_schema(_Roster(["小红"]))
+    for i in range(utils.SCHEMA_CACHE_SIZE * 2):
+        talk.build_schema(_Roster([f"路人{i}"]))
+
+    assert utils._compile_schema.cache_info().currsize <= utils.SCHEMA_CACHE_SIZE
+    assert utils._literal_type.cache_info().currsize <= utils.LITERAL_CACHE_SIZE
+    assert talk.build_schema(_Roster(["小红"])) is talk.build_schema(_Roster(["小红"]))
+    assert first.model_fields["目标"].annotation.__args__ == ("小红",)